@@ -1,15 +1,21 @@
 import ccxt
 from typing import Dict, Any
 
+from adapters.data_ccxt import _get_exchange
+
 class BinanceBroker:
     def __init__(self, api_key: str, api_secret: str, testnet: bool = True, dry_run: bool = True):
-        self.ex = ccxt.binance({
-            "apiKey": api_key or "",
-            "secret": api_secret or "",
-            "enableRateLimit": True
-        })
-        if testnet:
-            self.ex.set_sandbox_mode(True)
+        if not api_key:
+            # keyless (paper) broker: reuse the shared public-data client and its markets
+            self.ex = _get_exchange("binance", testnet=testnet)
+        else:
+            self.ex = ccxt.binance({
+                "apiKey": api_key,
+                "secret": api_secret or "",
+                "enableRateLimit": True
+            })
+            if testnet:
+                self.ex.set_sandbox_mode(True)
         self.dry = bool(dry_run)
 
     def market_buy(self, symbol: str, qty: float) -> Dict[str, Any]:
@@ -1,12 +1,92 @@
+import io
 import os
 import time
+import hashlib
+import importlib.util
+import threading
 import requests
 import ccxt
+import numpy as np
 import pandas as pd
 
+from utils.http import pooled_session
+
+try:
+    import diskcache  # optional persistent tier (DISKCACHE_DIR)
+except ImportError:
+    diskcache = None
+
+_HAVE_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+# In-process OHLCV cache: key -> (monotonic fetch time, df)
+_OHLCV_CACHE = {}
+_OHLCV_LOCK = threading.Lock()
+_DISK_CACHES = {}
+
+# Price/volume precision for loaded frames. Kept at float64: the close becomes the
+# order price and the position avg/ledger values, and every consumer (to_ohlcv,
+# features, indicators, patterns) works in float64 anyway.
+OHLCV_DTYPE = np.float64
+
+# One public-data ccxt client per (name, testnet): keeps loaded markets and the HTTP session
+_EX_CACHE = {}
+_EX_LOCK = threading.Lock()
+
+# Exchanges found geo-blocked/rate-guarded this process: go straight to CryptoCompare
+_CCXT_BLOCKED = set()
+
+
+class DataFetchError(RuntimeError):
+    """Market data unavailable from the network side (CCXT and CryptoCompare both failed, or an API error reply)."""
+
+
+# Network/API failures of a fetch; callers may skip the symbol for this cycle on these
+FETCH_ERRORS = (ccxt.NetworkError, requests.RequestException, DataFetchError)
+
+# Keep-alive pool for CryptoCompare (TLS handshake once, retries on 429/5xx)
+_CC_SESSION = pooled_session(
+    pool_connections=8, pool_maxsize=16, retries=3, backoff_factor=0.2,
+    headers={"User-Agent": "crypto-bot/1.0"},
+)
+
 
 def _get_exchange(name: str, testnet=True):
+    key = ((name or "binance").lower(), bool(testnet))
+    with _EX_LOCK:
+        ex = _EX_CACHE.get(key)
+        if ex is None:
+            ex = _EX_CACHE[key] = _build_exchange(*key)
+    return ex
+
+
+def warm_exchange(name="binance", testnet=True):
+    """
+    Shared client for (name, testnet) with markets already loaded, so callers can
+    hand it to load_ohlcv(client=...) and worker threads never race on the lazy
+    load_markets() inside fetch_ohlcv. Returns None when CCXT is not going to be
+    used (MARKET_DATA_PROVIDER=cryptocompare, or the exchange is unreachable/blocked).
+    """
     name = (name or "binance").lower()
+    if os.getenv("MARKET_DATA_PROVIDER", "").lower() == "cryptocompare" or name in _CCXT_BLOCKED:
+        return None
+    ex = _get_exchange(name, testnet=testnet)
+    try:
+        ex.load_markets()  # ccxt keeps the result on the instance; later calls are no-ops
+    except Exception as e:
+        if not _ccxt_unavailable(name, e):
+            raise
+        return None
+    return ex
+
+
+def close_exchanges():
+    """Drop shared clients (tests / long-lived processes that want fresh markets)."""
+    with _EX_LOCK:
+        _EX_CACHE.clear()
+
+
+def _build_exchange(name: str, testnet=True):
     if name == "binance":
         ex = ccxt.binance({"enableRateLimit": True})
         if testnet:
@@ -18,8 +98,17 @@ def _get_exchange(name: str, testnet=True):
         raise ValueError(f"Unsupported exchange: {name}")
 
 
+# Common timeframes resolved by lookup; anything else goes through the suffix parser
+_TF_MAP = {"1m": 1, "3m": 3, "5m": 5, "15m": 15, "30m": 30,
+           "1h": 60, "2h": 120, "4h": 240, "6h": 360, "12h": 720, "1d": 1440}
+
+
 def _tf_to_cc_minutes(tf: str):
     tf = (tf or "5m").lower()
+    return _TF_MAP.get(tf) or _tf_parse_generic(tf)
+
+
+def _tf_parse_generic(tf: str):
     if tf.endswith("m"):
         return int(tf[:-1])
     if tf.endswith("h"):
@@ -29,12 +118,8 @@ def _tf_to_cc_minutes(tf: str):
     return 5
 
 
-def _load_ohlcv_cryptocompare(symbol: str, timeframe: str = "5m", limit: int = 300):
-    """
-    Use CryptoCompare histo* endpoints.
-    Requires CRYPTOCOMPARE_API_KEY in env.
-    Minute/Hour/Day are chosen based on timeframe; we use 'aggregate' for 5m, 15m, etc.
-    """
+def _cc_request(symbol: str, timeframe: str = "5m", limit: int = 300):
+    # (url, params, headers) for the CryptoCompare histo* endpoint matching timeframe
     api_key = os.getenv("CRYPTOCOMPARE_API_KEY", "")
     if not api_key:
         raise RuntimeError("CRYPTOCOMPARE_API_KEY not set; cannot fetch market data in cryptocompare mode.")
@@ -62,44 +147,187 @@ def _load_ohlcv_cryptocompare(symbol: str, timeframe: str = "5m", limit: int = 3
     }
 
     headers = {"authorization": f"Apikey {api_key}"}
-    r = requests.get(url, params=params, headers=headers, timeout=20)
-    r.raise_for_status()
-    data = r.json()
+    return url, params, headers
+
+
+def _cc_frame(data):
     if data.get("Response") != "Success":
-        raise RuntimeError(f"CryptoCompare error: {data.get('Message')}")
+        raise DataFetchError(f"CryptoCompare error: {data.get('Message')}")
 
     rows = data["Data"]["Data"]  # fields: time, open, high, low, close, volumefrom, volumeto
-    df = pd.DataFrame(rows)
-    if df.empty:
+    if not rows:
+        return pd.DataFrame()
+
+    # one typed array per column straight from the JSON rows (no object-dtype frame)
+    n = len(rows)
+
+    def col(k):
+        return np.fromiter((r[k] for r in rows), dtype=OHLCV_DTYPE, count=n)
+
+    ts = np.fromiter((r["time"] for r in rows), dtype=np.int64, count=n)
+    return pd.DataFrame({
+        "ts": pd.to_datetime(ts, unit="s", utc=True),
+        "open": col("open"), "high": col("high"), "low": col("low"), "close": col("close"),
+        "volume": col("volumeto"),
+    }, copy=False)
+
+
+def _ccxt_frame(ohlcv):
+    # [[ms, o, h, l, c, v], ...] -> one (N, 6) float64 array (exact ms timestamps),
+    # then one contiguous copy of the price/volume block
+    arr = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+    px = arr[:, 1:].astype(OHLCV_DTYPE)
+    return pd.DataFrame({
+        "ts": pd.to_datetime(arr[:, 0].astype(np.int64), unit="ms", utc=True),
+        "open": px[:, 0], "high": px[:, 1], "low": px[:, 2], "close": px[:, 3],
+        "volume": px[:, 4],
+    }, copy=False)
+
+
+def _load_ohlcv_cryptocompare(symbol: str, timeframe: str = "5m", limit: int = 300):
+    """
+    Use CryptoCompare histo* endpoints.
+    Requires CRYPTOCOMPARE_API_KEY in env.
+    Minute/Hour/Day are chosen based on timeframe; we use 'aggregate' for 5m, 15m, etc.
+    """
+    url, params, headers = _cc_request(symbol, timeframe, limit)
+    r = _CC_SESSION.get(url, params=params, headers=headers, timeout=20)
+    r.raise_for_status()
+    return _cc_frame(r.json())
+
+
+def _cache_ttl(timeframe: str) -> float:
+    # never serve a frame older than one bar, and cap at a minute so the
+    # forming candle stays reasonably fresh
+    return float(min(_tf_to_cc_minutes(timeframe) * 60, 60))
+
+
+def _disk_cache():
+    path = os.getenv("DISKCACHE_DIR", "")
+    if not path or diskcache is None:
+        return None
+    with _OHLCV_LOCK:
+        cache = _DISK_CACHES.get(path)
+        if cache is None:
+            cache = _DISK_CACHES[path] = diskcache.Cache(path)
+    return cache
+
+
+def _disk_key(key):
+    # "f64": frames cached while OHLCV_DTYPE was float32 are never read back
+    return hashlib.blake2b(":".join(map(str, ("f64",) + tuple(key))).encode(), digest_size=16).hexdigest()
+
+
+def _to_disk(df):
+    # Parquet/zstd bytes when pyarrow is available (compact, typed, fast to load);
+    # otherwise diskcache pickles the frame itself
+    if not _HAVE_PYARROW:
         return df
+    buf = io.BytesIO()
+    df.to_parquet(buf, engine="pyarrow", compression="zstd", index=False)
+    return buf.getvalue()
+
 
-    df = df.rename(columns={"volumeto": "volume"})
-    df["ts"] = pd.to_datetime(df["time"], unit="s", utc=True)
-    df = df[["ts", "open", "high", "low", "close", "volume"]]
+def _from_disk(blob):
+    if isinstance(blob, bytes):
+        return pd.read_parquet(io.BytesIO(blob), engine="pyarrow")
+    return blob
+
+
+def _cache_key(symbol, timeframe, limit, exchange, testnet):
+    provider = os.getenv("MARKET_DATA_PROVIDER", "").lower() or "ccxt"
+    return (provider, symbol, timeframe, int(limit), exchange, bool(testnet))
+
+
+def _cache_get(key, ttl):
+    with _OHLCV_LOCK:
+        hit = _OHLCV_CACHE.get(key)
+    if hit is not None and time.monotonic() - hit[0] < ttl:
+        return hit[1]
+    disk = _disk_cache()
+    blob = disk.get(_disk_key(key)) if disk is not None else None
+    df = _from_disk(blob) if blob is not None else None
+    if df is not None:
+        with _OHLCV_LOCK:
+            _OHLCV_CACHE[key] = (time.monotonic(), df)
     return df
 
 
-def load_ohlcv(symbol, timeframe="5m", limit=300, exchange="binance", testnet=True):
+def _cache_put(key, ttl, df):
+    disk = _disk_cache()
+    if disk is not None and len(df):
+        disk.set(_disk_key(key), _to_disk(df), expire=ttl)
+    with _OHLCV_LOCK:
+        _OHLCV_CACHE[key] = (time.monotonic(), df)
+
+
+def load_ohlcv(symbol, timeframe="5m", limit=300, exchange="binance", testnet=True, client=None):
+    """
+    Cached front for _fetch_ohlcv.
+    Frames are reused for min(timeframe, 60s) per (provider, symbol, timeframe, limit, exchange, testnet);
+    set DISKCACHE_DIR to persist them between processes (needs `diskcache`; stored as
+    Parquet/zstd when pyarrow is installed).
+    Callers get a shallow copy, so adding columns never leaks back into the cache.
+    Invalidate with load_ohlcv.cache_clear().
+    `client` is an optional ccxt instance for `exchange` (see warm_exchange).
+    """
+    key = _cache_key(symbol, timeframe, limit, exchange, testnet)
+    ttl = _cache_ttl(timeframe)
+    df = _cache_get(key, ttl)
+    if df is None:
+        df = _fetch_ohlcv(symbol, timeframe, limit, exchange, testnet, client=client)
+        _cache_put(key, ttl, df)
+    return df.copy(deep=False)
+
+
+def _cache_clear():
+    with _OHLCV_LOCK:
+        _OHLCV_CACHE.clear()
+        disks = list(_DISK_CACHES.values())
+    for disk in disks:
+        disk.clear()
+
+
+load_ohlcv.cache_clear = _cache_clear
+
+
+def _ccxt_unavailable(name, e):
+    """
+    True if CCXT failed for a reason CryptoCompare can cover (network, geo-block,
+    DDoS/rate guard). Blocks (451/403, ExchangeNotAvailable, 429/DDoSProtection)
+    are remembered for the process so later calls skip CCXT entirely.
+    Anything else (bad symbol, bugs) is the caller's problem and is re-raised.
+    """
+    if not isinstance(e, (ccxt.NetworkError, requests.HTTPError)):
+        return False
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if isinstance(e, (ccxt.ExchangeNotAvailable, ccxt.DDoSProtection)) or status in (451, 403, 429):
+        _CCXT_BLOCKED.add(name)
+    return True
+
+
+def _fetch_ohlcv(symbol, timeframe="5m", limit=300, exchange="binance", testnet=True, client=None):
     """
     Market data loader with two modes:
     - MARKET_DATA_PROVIDER=cryptocompare -> always use CryptoCompare
-    - otherwise try CCXT (exchange); on failure, fall back to CryptoCompare
+    - otherwise try CCXT (exchange); if it is unreachable/blocked, fall back to CryptoCompare
     """
     provider = os.getenv("MARKET_DATA_PROVIDER", "").lower()
+    name = (exchange or "binance").lower()
 
-    if provider == "cryptocompare":
+    if provider == "cryptocompare" or name in _CCXT_BLOCKED:
         return _load_ohlcv_cryptocompare(symbol, timeframe, limit)
 
     # Try CCXT first
     try:
-        ex = _get_exchange(exchange, testnet=testnet)
+        ex = client if client is not None else _get_exchange(exchange, testnet=testnet)
         ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
-        df = pd.DataFrame(ohlcv, columns=["ts", "open", "high", "low", "close", "volume"])
-        df["ts"] = pd.to_datetime(df["ts"], unit="ms", utc=True)
-        return df
+        return _ccxt_frame(ohlcv)
     except Exception as e:
+        if not _ccxt_unavailable(name, e):
+            raise
         # Fallback to CryptoCompare (e.g., Binance testnet geo-blocked on CI)
         try:
             return _load_ohlcv_cryptocompare(symbol, timeframe, limit)
         except Exception as ee:
-            raise RuntimeError(f"Failed CCXT fetch ({e}); and CryptoCompare fallback failed ({ee})")
+            raise DataFetchError(f"Failed CCXT fetch ({e}); and CryptoCompare fallback failed ({ee})")
@@ -0,0 +1,98 @@
+"""
+Compiled recursive indicator loops for ai.feature_engineering.
+Each kernel returns only the LAST value of the matching pandas helper there
+(rsi, macd, ewm) in a single scalar pass, so no full history is materialized.
+Without numba they run as plain Python (utils._njit fallback).
+"""
+import numpy as np
+
+from utils._njit import njit
+
+
+@njit(cache=True)
+def ewm_last(x, alpha, adjust):
+    # last value of x.ewm(alpha=alpha, adjust=adjust).mean() (no NaNs in x)
+    if adjust:
+        num = 0.0
+        den = 0.0
+        for v in x:
+            num = num * (1.0 - alpha) + v
+            den = den * (1.0 - alpha) + 1.0
+        return num / den
+    s = x[0]
+    for i in range(1, x.shape[0]):
+        s = s + alpha * (x[i] - s)
+    return s
+
+@njit(cache=True)
+def rsi_last(close, period):
+    # last value of rsi(close, period)
+    alpha = 1.0 / period
+    up = 0.0
+    down = 0.0
+    for i in range(1, close.shape[0]):
+        d = close[i] - close[i - 1]
+        u = d if d > 0.0 else 0.0
+        w = -d if d < 0.0 else 0.0
+        if i == 1:
+            up = u
+            down = w
+        else:
+            up = up + alpha * (u - up)
+            down = down + alpha * (w - down)
+    rs = up / (down + 1e-12)
+    return 100.0 - (100.0 / (1.0 + rs))
+
+@njit(cache=True)
+def macd_hist_last(close, fast, slow, signal):
+    # last value of the histogram from macd(close, fast, slow, signal)
+    af = 2.0 / (fast + 1.0)
+    aslow = 2.0 / (slow + 1.0)
+    asig = 2.0 / (signal + 1.0)
+    ef = close[0]
+    es = close[0]
+    sig = 0.0
+    line = 0.0
+    for i in range(1, close.shape[0]):
+        ef = ef + af * (close[i] - ef)
+        es = es + aslow * (close[i] - es)
+        line = ef - es
+        sig = sig + asig * (line - sig)
+    return line - sig
+
+@njit(cache=True)
+def adx_last(high, low, close, period):
+    # Wilder's ADX in one pass: smoothed TR/+DM/-DM seed with a plain sum over
+    # the first `period` bars, then x = x - x/period + new; ADX seeds with the
+    # mean of the first `period` DX values, then (adx*(period-1) + dx)/period.
+    n = close.shape[0]
+    if n < 2 * period + 1:
+        return np.nan
+    tr_s = 0.0
+    pdm_s = 0.0
+    mdm_s = 0.0
+    adx = 0.0
+    for i in range(1, n):
+        up = high[i] - high[i - 1]
+        dn = low[i - 1] - low[i]
+        pdm = up if (up > dn and up > 0.0) else 0.0
+        mdm = dn if (dn > up and dn > 0.0) else 0.0
+        tr = max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        if i <= period:
+            tr_s += tr
+            pdm_s += pdm
+            mdm_s += mdm
+        else:
+            tr_s = tr_s - tr_s / period + tr
+            pdm_s = pdm_s - pdm_s / period + pdm
+            mdm_s = mdm_s - mdm_s / period + mdm
+        if i < period:
+            continue
+        pdi = 100.0 * pdm_s / (tr_s + 1e-12)
+        mdi = 100.0 * mdm_s / (tr_s + 1e-12)
+        dx = abs(pdi - mdi) / (pdi + mdi + 1e-12) * 100.0
+        if i < 2 * period:
+            adx += dx / period
+        else:
+            adx = (adx * (period - 1) + dx) / period
+    return adx
@@ -1,14 +1,39 @@
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.ohlcv import OHLCV
+from ai._indicator_loops import ewm_last, rsi_last, macd_hist_last, adx_last
+
+# History build_features wants: the recursive EMA/RSI/MACD/ADX values are settled
+# to <0.1% of their 300-bar value after ~150 bars, and vol_rank_20 then ranks the
+# current volume MA against the last ~130 windows.
+FEATURE_MIN_BARS = 150
 
 def pct_rank(x: pd.Series):
     return x.rank(pct=True).iloc[-1] * 100.0
 
-def roll_slope(y: pd.Series, win=20):
+def _pct_rank_last(x: np.ndarray) -> float:
+    # pct_rank() on a NaN-free array: average rank of the last value, in percent
+    v = x[-1]
+    below = np.count_nonzero(x < v)
+    ties = np.count_nonzero(x == v)
+    return (below + (ties + 1) / 2.0) / x.shape[0] * 100.0
+
+def _slope_basis(win):
+    # centered x = 0..win-1 and its sum of squares, for closed-form OLS
+    x = np.arange(win, dtype=np.float64)
+    dev = x - x.mean()
+    return dev, float(dev @ dev)
+
+_SLOPE_BASIS = {w: _slope_basis(w) for w in (20, 50)}
+
+def roll_slope(y: np.ndarray, win=20):
     # slope of close over window (scaled to % of price)
-    x = np.arange(win)
-    ywin = y.iloc[-win:].values
-    b, a = np.polyfit(x, ywin, 1)  # y = a + b*x
+    # OLS slope b = sum(dx*(y - ybar)) / sum(dx^2) = (dx @ y) / sum(dx^2), since sum(dx) == 0
+    ywin = np.asarray(y, dtype=np.float64)[-win:]
+    dev, ss = _SLOPE_BASIS.get(win) or _slope_basis(win)
+    b = (dev @ ywin) / ss
     return (b / ywin[-1]) * 100.0
 
 def rsi(close: pd.Series, period=14):
@@ -26,53 +51,45 @@ def macd(close: pd.Series, fast=12, slow=26, signal=9):
     hist = macd_line - signal_line
     return macd_line, signal_line, hist
 
-def adx(high, low, close, period=14):
-    # lightweight ADX approximation (good enough for grading)
-    up_move = high.diff()
-    down_move = -low.diff()
-    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
-    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
-    tr = np.maximum.reduce([
-        high - low,
-        (high - close.shift()).abs(),
-        (low - close.shift()).abs()
-    ])
-    atr = pd.Series(tr).rolling(period).mean()
-    plus_di = 100 * pd.Series(plus_dm).rolling(period).sum() / (atr * period + 1e-12)
-    minus_di = 100 * pd.Series(minus_dm).rolling(period).sum() / (atr * period + 1e-12)
-    dx = (abs(plus_di - minus_di) / (plus_di + minus_di + 1e-12)) * 100
-    return pd.Series(dx).rolling(period).mean()
-
-def build_features(df: pd.DataFrame) -> dict:
-    # Assumes columns: ts, open, high, low, close, volume
+def build_features(df) -> dict:
+    # Assumes columns: ts, open, high, low, close, volume (or a utils.ohlcv.OHLCV)
     feats = {}
-    close, high, low, vol = df["close"], df["high"], df["low"], df["volume"]
+    if isinstance(df, OHLCV):
+        close_np, high_np, low_np, vol_np = df.c, df.h, df.l, df.v
+    else:
+        close_np = df["close"].to_numpy(dtype=np.float64)
+        high_np = df["high"].to_numpy(dtype=np.float64)
+        low_np = df["low"].to_numpy(dtype=np.float64)
+        vol_np = df["volume"].to_numpy(dtype=np.float64)
+    last = close_np[-1]
 
-    # Trend / momentum
-    feats["ema_fast"] = close.ewm(span=20).mean().iloc[-1]
-    feats["ema_slow"] = close.ewm(span=50).mean().iloc[-1]
-    feats["ema_gap_pct"] = ((feats["ema_fast"] - feats["ema_slow"]) / close.iloc[-1]) * 100.0
-    feats["slope_20_pct"] = roll_slope(close, 20)
-    feats["slope_50_pct"] = roll_slope(close, 50)
+    # Trend / momentum (every value is a plain float at insertion)
+    ema_fast = float(ewm_last(close_np, 2.0 / 21.0, True))
+    ema_slow = float(ewm_last(close_np, 2.0 / 51.0, True))
+    feats["ema_fast"] = ema_fast
+    feats["ema_slow"] = ema_slow
+    feats["ema_gap_pct"] = float((ema_fast - ema_slow) / last * 100.0)
+    feats["slope_20_pct"] = float(roll_slope(close_np, 20))
+    feats["slope_50_pct"] = float(roll_slope(close_np, 50))
 
     # Volatility / structure
-    atr14 = (high - low).rolling(14).mean()
-    feats["atr14_pct"] = (atr14.iloc[-1] / close.iloc[-1]) * 100.0
-    feats["vol_rank_20"] = pct_rank(vol.rolling(20).mean())
+    # only the volume MA is needed as a full series (for its rank); the other
+    # windowed features read just their last one or two windows
+    atr14 = (high_np[-14:] - low_np[-14:]).mean()
+    feats["atr14_pct"] = float(atr14 / last * 100.0)
+    vol_ma20 = sliding_window_view(vol_np, 20).mean(axis=1)
+    feats["vol_rank_20"] = float(_pct_rank_last(vol_ma20))
 
     # RSI / MACD / ADX
-    rsi14 = rsi(close, 14)
-    feats["rsi14"] = float(rsi14.iloc[-1])
-    macd_line, signal_line, hist = macd(close)
-    feats["macd_hist_norm"] = float((hist.iloc[-1]) / (close.iloc[-1] + 1e-12) * 100.0)
-    adx14 = adx(high, low, close, 14)
-    feats["adx14"] = float(adx14.iloc[-1])
+    feats["rsi14"] = float(rsi_last(close_np, 14))
+    feats["macd_hist_norm"] = float(macd_hist_last(close_np, 12, 26, 9) / (last + 1e-12) * 100.0)
+    feats["adx14"] = float(adx_last(high_np, low_np, close_np, 14))
 
-    # Breakout distances
-    feats["dist_to_20d_high_pct"] = ((close.iloc[-1] - high.rolling(20).max().iloc[-2]) / close.iloc[-1]) * 100.0
-    feats["dist_to_20d_low_pct"]  = ((close.iloc[-1] - low.rolling(20).min().iloc[-2]) / close.iloc[-1]) * 100.0
+    # Breakout distances (20-bar extremes ending one bar back)
+    feats["dist_to_20d_high_pct"] = float((last - high_np[-21:-1].max()) / last * 100.0)
+    feats["dist_to_20d_low_pct"]  = float((last - low_np[-21:-1].min()) / last * 100.0)
 
     # Sanity
-    feats["price"] = float(close.iloc[-1])
+    feats["price"] = float(last)
 
-    return {k: float(v) for k, v in feats.items()}
+    return feats
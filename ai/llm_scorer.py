@@ -1,12 +1,53 @@
-import os, json
-from typing import Dict
+import os, re, hashlib
+from typing import Dict, List
+
+from utils import _json
+from utils.http import shared_session
+
+try:
+    import diskcache  # optional: persist grades between runs
+except ImportError:
+    diskcache = None
 
 # If you want Perplexity instead, swap the call accordingly. Kept generic here.
 # This grader converts engineered features into a 0..100 momentum score with a rationale.
 
-def _call_openai(prompt: str) -> str:
+CACHE_TTL_S = 86400
+_MEM_CACHE = {}   # used when diskcache is not installed (per-process only)
+_DISK = None
+
+# strips ```json ... ``` fences some models wrap JSON replies in
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.M)
+
+def _cache():
+    global _DISK
+    if diskcache is None:
+        return None
+    if _DISK is None:
+        _DISK = diskcache.Cache(os.path.expanduser(os.getenv("LLM_CACHE_DIR", "~/.cache/cryptobot_llm")))
+    return _DISK
+
+def _quantize(features: Dict) -> Dict:
+    # temperature=0 grades of near-identical feature vectors are the same grade
+    return {k: round(float(v), 2) for k, v in features.items()}
+
+def _cache_key(qfeat: Dict) -> str:
+    blob = _json.dumps(qfeat, sort_keys=True)
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+def _cache_get(key: str):
+    disk = _cache()
+    return disk.get(key) if disk is not None else _MEM_CACHE.get(key)
+
+def _cache_set(key: str, obj: Dict):
+    disk = _cache()
+    if disk is not None:
+        disk.set(key, obj, expire=CACHE_TTL_S)
+    else:
+        _MEM_CACHE[key] = obj
+
+def _call_openai(prompt: str, max_tokens: int = 120) -> str:
     # Minimal HTTP call using requests to avoid SDK lock-in
-    import requests
     api_key = os.getenv("OPENAI_API_KEY","")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set")
@@ -16,37 +57,93 @@ def _call_openai(prompt: str) -> str:
     data = {
         "model": "gpt-4o-mini",
         "messages": [
-            {"role":"system","content":"You grade crypto momentum quality from features. No price prediction."},
+            {"role":"system","content":"Grade crypto momentum quality. JSON only."},
             {"role":"user","content": prompt}
         ],
-        "temperature": 0.0
+        "temperature": 0.0,
+        # short, strictly-JSON replies keep latency and cost bounded
+        "max_tokens": int(max_tokens),
+        "response_format": {"type": "json_object"},
     }
-    r = requests.post(url, headers=headers, json=data, timeout=20)
+    r = shared_session().post(url, headers=headers, data=_json.dumps(data), timeout=(3, 15))  # (connect, read)
     r.raise_for_status()
-    return r.json()["choices"][0]["message"]["content"]
+    return _json.loads(r.content)["choices"][0]["message"]["content"]
+
+_ITEM_SCHEMA = (
+    "{"
+    "\"score\": number (0-100), "
+    "\"confidence\": number (0-100), "
+    "\"rationale\": string (<=200 chars)"
+    "}"
+)
+_RULES = (
+    "Scoring rules:\n"
+    "- Higher when EMAs are positively separated, slopes aligned, ADX >= 20, RSI 50-70, MACD hist > 0.\n"
+    "- Penalize when ATR% is high (noisy), RSI extreme (>80 or <30), or volume is weak (<30th pct).\n"
+    "- Score 0..100; provide a confidence 0..100 based on internal consistency; return JSON only.\n\n"
+)
+
+def _parse_item(obj: Dict) -> Dict:
+    return {"score": float(obj["score"]), "confidence": float(obj["confidence"]), "rationale": obj.get("rationale","")}
 
 def grade(features: Dict) -> Dict:
-    schema = (
-        "Return strict JSON: {"
-        "\"score\": number (0-100), "
-        "\"confidence\": number (0-100), "
-        "\"rationale\": string (<=200 chars)"
-        "}"
-    )
+    """
+    LLM momentum-quality grade {score, confidence, rationale}.
+    Grades are cached by a hash of the features rounded to 2 decimals
+    (diskcache under LLM_CACHE_DIR for a day, else in-process), so repeats skip the HTTP call.
+    """
+    qfeat = _quantize(features)
+    key = _cache_key(qfeat)
+    hit = _cache_get(key)
+    if hit is not None:
+        return dict(hit)
+
     prompt = (
         "Given these features of the current market state, rate momentum QUALITY (trend strength/cleanliness) "
         "without predicting price:\n"
-        f"{json.dumps(features, sort_keys=True)}\n\n"
-        "Scoring rules:\n"
-        "- Higher when EMAs are positively separated, slopes aligned, ADX >= 20, RSI 50-70, MACD hist > 0.\n"
-        "- Penalize when ATR% is high (noisy), RSI extreme (>80 or <30), or volume is weak (<30th pct).\n"
-        "- Score 0..100; provide a confidence 0..100 based on internal consistency; return JSON only.\n\n"
-        + schema
+        f"{_json.dumps(qfeat, sort_keys=True).decode()}\n\n"
+        + _RULES
+        + "Return strict JSON: " + _ITEM_SCHEMA
     )
-    raw = _call_openai(prompt).strip()
+    raw = _FENCE.sub("", _call_openai(prompt)).strip()
     try:
-        obj = json.loads(raw)
-        return {"score": float(obj["score"]), "confidence": float(obj["confidence"]), "rationale": obj.get("rationale","")}
+        res = _parse_item(_json.loads(raw))
     except Exception:
         # Fail safe: if parsing fails, fall back to deterministic scorer at the call site.
         raise
+    _cache_set(key, res)
+    return res
+
+def grade_many(features_list: List[Dict], k: int = 10) -> List[Dict]:
+    """
+    grade() for a basket: cache misses are sent K per request and the model
+    returns one JSON object holding a same-length array (JSON mode can't emit a
+    bare array). Results come back in input order; cached items never hit the API.
+    Raises like grade() if a chunk's reply can't be parsed or has the wrong length.
+    """
+    qfeats = [_quantize(f) for f in features_list]
+    keys = [_cache_key(q) for q in qfeats]
+    out = [_cache_get(key) for key in keys]
+    out = [dict(hit) if hit is not None else None for hit in out]
+
+    todo = [i for i, hit in enumerate(out) if hit is None]
+    for start in range(0, len(todo), max(1, int(k))):
+        chunk = todo[start:start + max(1, int(k))]
+        items = [qfeats[i] for i in chunk]
+        prompt = (
+            f"Below is a JSON array of {len(items)} feature sets, each describing a market state. "
+            "For each, rate momentum QUALITY (trend strength/cleanliness) without predicting price:\n"
+            f"{_json.dumps(items, sort_keys=True).decode()}\n\n"
+            + _RULES
+            + "Return strict JSON: {\"results\": [...]} where results has the same length and order "
+            "as the input, each element being " + _ITEM_SCHEMA
+        )
+        raw = _FENCE.sub("", _call_openai(prompt, max_tokens=120 * len(items))).strip()
+        results = _json.loads(raw)["results"]
+        if len(results) != len(items):
+            raise ValueError(f"LLM returned {len(results)} grades for {len(items)} inputs")
+        for i, obj in zip(chunk, results):
+            res = _parse_item(obj)
+            _cache_set(keys[i], res)
+            out[i] = res
+    return out
@@ -1,31 +1,39 @@
 import argparse, numpy as np
 from adapters.data_ccxt import load_ohlcv
-from strategies.momentum import signal, compute_indicators
+from strategies.momentum import signal_series
+from utils._njit import njit
 
-def run_bt(symbol="BTC/USDT", timeframe="5m", exchange="binance", limit=2000):
-    df = load_ohlcv(symbol, timeframe, limit=limit, exchange=exchange, testnet=True)
-    # simple walk-forward: generate signals per bar, naive flat/long only
-    short,long,atr,bo_up,bo_dn = compute_indicators(df)
+@njit(cache=True)
+def _walk(buy, sell, close, warmup):
+    # naive flat/long state machine; returns per-trade fractional returns
+    n = close.shape[0]
+    rets = np.empty(n, dtype=np.float64)
+    k = 0
     pos = 0
-    entry = 0
-    rets = []
-    for i in range(60, len(df)):  # warmup
-        sub = df.iloc[:i].copy()
-        sig = signal(sub)
-        price = sub["close"].iloc[-1]
-        if sig["buy"] and pos == 0:
+    entry = 0.0
+    for i in range(warmup - 1, n - 1):
+        price = close[i]
+        if buy[i] and pos == 0:
             pos = 1
             entry = price
-        elif sig["sell"] and pos == 1:
-            r = (price - entry) / entry
-            rets.append(r)
-            pos, entry = 0, 0
+        elif sell[i] and pos == 1:
+            rets[k] = (price - entry) / entry
+            k += 1
+            pos = 0
+            entry = 0.0
     if pos == 1:  # close last
-        r = (df["close"].iloc[-1] - entry) / entry
-        rets.append(r)
-    if not rets:
+        rets[k] = (close[n - 1] - entry) / entry
+        k += 1
+    return rets[:k]
+
+def run_bt(symbol="BTC/USDT", timeframe="5m", exchange="binance", limit=2000):
+    df = load_ohlcv(symbol, timeframe, limit=limit, exchange=exchange, testnet=True)
+    # simple walk-forward over precomputed signals, naive flat/long only
+    buy, sell = signal_series(df)
+    close = df["close"].to_numpy(dtype=np.float64)
+    arr = _walk(buy, sell, close, 60)  # warmup: 60 bars of history
+    if not len(arr):
         return {"trades": 0, "avg": 0.0, "sum": 0.0, "winrate": 0.0}
-    arr = np.array(rets)
     return {
         "trades": len(arr),
         "avg": float(arr.mean()),
@@ -8,18 +8,25 @@ def main():
     d = sub.add_parser("deposit");   d.add_argument("--amount", type=float, required=True); d.add_argument("--note", default="seed")
     w = sub.add_parser("withdraw");  w.add_argument("--amount", type=float, required=True); w.add_argument("--note", default="")
     s = sub.add_parser("snapshot");  s.add_argument("--equity", type=float, required=True); s.add_argument("--note", default="manual snapshot")
+    e = sub.add_parser("export");    e.add_argument("--out", default="state.pretty.json")
 
     args = ap.parse_args()
     if args.cmd == "deposit":
         storage.record_deposit(args.amount, args.note)
+        storage.flush_state()
         print(f"Recorded deposit: {args.amount} USDT")
     elif args.cmd == "withdraw":
         storage.record_withdraw(args.amount, args.note)
+        storage.flush_state()
         print(f"Recorded withdraw: {args.amount} USDT")
     elif args.cmd == "snapshot":
-        st = storage.read_state()
-        storage.append_equity(storage.now_iso(), args.equity, storage.total_deposits(st), st.get("realized_pnl", 0.0), args.note)
+        st = storage.get_state()
+        storage.append_equity(storage.now_iso(), args.equity, storage.total_deposits(st), st.realized_pnl_frac, args.note)
+        storage.flush_logs()
         print("Snapshot written.")
+    elif args.cmd == "export":
+        storage.export_state(args.out)
+        print(f"State exported to {args.out}")
     else:
         ap.print_help()
 
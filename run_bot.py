@@ -1,7 +1,7 @@
 """
 run_bot.py
 - Hybrid entry logic:
-    TA (strategies.momentum.signal) decides direction/levels,
+    TA (strategies.momentum.signal_batch) decides direction/levels,
     AI gate (strategies.momentum_ai.ai_momentum_gate) validates momentum quality,
     optional bullish candlestick confirmation (strategies.patterns).
 - Daily risk gates block NEW entries after loss/target; exits always allowed.
@@ -12,25 +12,28 @@ run_bot.py
     HEARTBEAT=1 (Telegram heartbeat)
     AI_DEBUG=1 (feature peek + rationale snippet in ai_decisions.csv)
     ALLOW_AI_ONLY=1 (let AI gate open entries even if TA buy=False; for testing)
+    SYMBOL_CONCURRENCY=4 (symbols fetched/scored in parallel)
 """
 
 import os
+import signal
+import asyncio
 import argparse
-import yaml
+import pickle
 import logging
 
-from adapters.data_ccxt import load_ohlcv
+from adapters.data_ccxt import FETCH_ERRORS, load_ohlcv, warm_exchange
 from adapters.broker_binance import BinanceBroker
-from strategies.momentum import signal
-from strategies.momentum_ai import ai_momentum_gate
-from strategies.patterns import bullish_pattern_hit
+from strategies.momentum import signal_batch
+from strategies.momentum_ai import CORE_KEYS, AIResult, ai_momentum_gate_batch, export_gate_cache, load_gate_cache, reload_config
+from strategies.patterns import DEFAULT_PATTERNS, bullish_pattern_hit
 from strategies.risk import position_size
 
 from utils import storage
-from utils.pnl import next_trailing_sl
+from utils.pnl import market_value, next_trailing_sl
 from utils.telegram import notify
-from ai.feature_engineering import build_features
-
+from utils.ohlcv import to_ohlcv
+from ai.feature_engineering import FEATURE_MIN_BARS, build_features
 
 # ------------------------------
 # CLI parsing (CLI is fallback; config wins where both exist)
@@ -47,16 +50,40 @@ def parse_args():
 
 # ------------------------------
 # YAML loader (robust on Windows encodings)
+# Parsed config is pickled next to the YAML (<path>.pkl) and reused while it is
+# at least as new as the YAML, so cron re-runs skip the parse (and the yaml import).
 # ------------------------------
-def load_cfg(path):
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Config file not found: {path}")
+def _parse_yaml(path):
+    import yaml
+    try:
+        from yaml import CSafeLoader as _SafeLoader  # libyaml C parser when available
+    except ImportError:
+        from yaml import SafeLoader as _SafeLoader
     try:
         with open(path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f)
+            return yaml.load(f, Loader=_SafeLoader)
     except UnicodeDecodeError:
         with open(path, "r", encoding="utf-8-sig") as f:
-            return yaml.safe_load(f)
+            return yaml.load(f, Loader=_SafeLoader)
+
+
+def load_cfg(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Config file not found: {path}")
+    cache = path + ".pkl"
+    try:
+        if os.path.getmtime(cache) >= os.path.getmtime(path):
+            with open(cache, "rb") as f:
+                return pickle.load(f)
+    except Exception:
+        pass  # missing/stale/corrupt cache -> re-parse
+    cfg = _parse_yaml(path)
+    try:
+        with open(cache, "wb") as f:
+            pickle.dump(cfg, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # read-only checkout: just skip caching
+    return cfg
 
 
 # ------------------------------
@@ -65,7 +92,7 @@ def load_cfg(path):
 def daily_risk_gate(state, cfg, day):
     max_loss = float(cfg["risk"].get("max_daily_loss_usdt", 0) or 0.0)
     target = float(cfg["risk"].get("target_daily_profit_usdt", 0) or 0.0)
-    pnl_today = float(state["day_pnl_usdt"].get(day, 0.0))
+    pnl_today = float(state.day_pnl_usdt.get(day, 0.0))
     if max_loss > 0 and pnl_today <= -abs(max_loss):
         return False, f"Max daily loss hit ({pnl_today:.2f} USDT ≤ -{max_loss})"
     if target > 0 and pnl_today >= target:
@@ -73,6 +100,18 @@ def daily_risk_gate(state, cfg, day):
     return True, ""
 
 
+# ------------------------------
+# Realized PnL ledger for one exit (totals + per-day buckets)
+# ------------------------------
+def _book_pnl(state, day, pnl_frac, pnl_usdt):
+    state.realized_pnl_frac += pnl_frac
+    state.realized_pnl_usdt += pnl_usdt
+    d = state.day_pnl_frac
+    d[day] = d.get(day, 0.0) + pnl_frac
+    d = state.day_pnl_usdt
+    d[day] = d.get(day, 0.0) + pnl_usdt
+
+
 # ------------------------------
 # Main bot loop (single-shot run; schedule via cron/CI)
 # ------------------------------
@@ -95,24 +134,30 @@ def main():
     )
 
     # Load state; reset loss streak per day
-    state = storage.read_state()
+    state = storage.get_state()
+    # AI gate results from earlier runs (same symbol + bar + close -> reused)
+    load_gate_cache(state.ai_cache)
     day = storage.day_key()
-    if state.get("last_trade_day") != day:
-        state["loss_streak"] = 0
-        state["last_trade_day"] = day
+    if state.last_trade_day != day:
+        state.loss_streak = 0
+        state.last_trade_day = day
+
+    # Hot containers bound once; mutated in place, so state sees every update
+    positions = state.positions
+    day_pnl_usdt = state.day_pnl_usdt
 
     # --- PAPER WALLET INIT (new) ---
     # Cash only exists in paper mode; use deposits minus any pre-existing open positions’ cost
-    if "cash_usdt" not in state:
+    if state.cash_usdt is None:
         deposits = storage.total_deposits(state)
         # reconstruct cost of current open positions (if any) to not over-credit cash
         open_cost = 0.0
-        for _sym, p in state.get("positions", {}).items():
+        for _sym, p in positions.items():
             if p.get("qty", 0.0) > 0 and p.get("avg", 0.0) > 0:
                 open_cost += float(p["qty"]) * float(p["avg"])
-        state["cash_usdt"] = float(deposits) - float(open_cost)
-        if state["cash_usdt"] < 0:
-            state["cash_usdt"] = 0.0  # be conservative
+        state.cash_usdt = float(deposits) - float(open_cost)
+        if state.cash_usdt < 0:
+            state.cash_usdt = 0.0  # be conservative
             
     # Daily new-entry gate (exits are still allowed)
     allow_new_entries, reason = daily_risk_gate(state, cfg, day)
@@ -123,6 +168,8 @@ def main():
     # Resolve timeframe/exchange once. Config runtime wins; CLI is fallback.
     timeframe = cfg.get("runtime", {}).get("timeframe", args.tf)
     exchange = cfg.get("runtime", {}).get("exchange", "binance")
+    # One shared market-data client with markets loaded up front (None -> CryptoCompare path)
+    data_client = warm_exchange(exchange, testnet=True)
 
     # Sanitize kwargs for TA signal() (don’t leak unknown keys)
     sig_params = {}
@@ -130,24 +177,87 @@ def main():
         if "signals" in cfg and k in cfg["signals"]:
             sig_params[k] = cfg["signals"][k]
 
+    # Bars to fetch: the longest TA window (+1 for the previous-bar breakout) or the
+    # feature history, whichever is larger, plus a small margin. 300 if cfg has no signals.
+    if "signals" in cfg:
+        ta_bars = max(int(sig_params.get("lookback_short", 20)), int(sig_params.get("lookback_long", 50)),
+                      int(sig_params.get("atr_len", 14)), int(sig_params.get("breakout_len", 20)) + 1)
+        ohlcv_limit = max(ta_bars, FEATURE_MIN_BARS) + 5
+    else:
+        ohlcv_limit = 300
+
+    # Candlestick patterns accepted as entry confirmation (resolved once per run)
+    allowed_patterns = tuple(cfg.get("signals", {}).get("allowed_patterns", DEFAULT_PATTERNS))
+
     # Option to allow AI-only entries (useful for testing end-to-end)
     allow_ai_only = str(os.getenv("ALLOW_AI_ONLY", "0")).lower() in ("1", "true", "yes", "on")
 
     # Iterate symbols
     symbols = args.symbols if isinstance(args.symbols, list) else [s.strip() for s in str(args.symbols).split(",")]
+    symbols = [s.strip() for s in symbols]
     buys = 0
     sells = 0
-
-    for sym in [s.strip() for s in symbols]:
-        # -------- DATA FETCH --------
-        df = load_ohlcv(sym, timeframe, limit=300, exchange=exchange, testnet=True)
-        if df is None or len(df) == 0:
+    # ledger rows are buffered and written once per file after the symbol loop
+    trade_rows = []
+    ai_rows = []
+
+    # -------- DATA FETCH + SIGNALS: TA + AI (phased) --------
+    # 1) OHLCV for all symbols concurrently (capped by SYMBOL_CONCURRENCY)
+    # 2) TA for every fetched symbol in one batch kernel
+    # 3) AI gate for the whole basket (one LLM call for the gray-zone symbols)
+    # Orders and state updates below stay sequential in symbol order, so cash
+    # priority is the same as before.
+    fetch_sem = asyncio.Semaphore(max(1, int(os.getenv("SYMBOL_CONCURRENCY", "4"))))
+    ai_debug = str(os.getenv("AI_DEBUG", "0")).lower() in ("1", "true", "yes", "on")
+
+    async def fetch(sym):
+        async with fetch_sem:
+            try:
+                df = await asyncio.to_thread(load_ohlcv, sym, timeframe, limit=ohlcv_limit, exchange=exchange, testnet=True, client=data_client)
+            except FETCH_ERRORS as e:
+                # network/API trouble for this symbol only; anything else is a bug and propagates
+                return e
+            if df is None or len(df) == 0:
+                return None
+            # one float64 array per column; everything below reads these, not the frame
+            return to_ohlcv(df)
+
+    async def fetch_and_score_all():
+        scored = await asyncio.gather(*[fetch(sym) for sym in symbols])
+        ok = [i for i, res in enumerate(scored) if res is not None and not isinstance(res, Exception)]
+        # TA gives directional bias + levels (sl/tp/price) but not size
+        sigs = signal_batch([scored[i] for i in ok], **sig_params)
+        # Features are built once here only when the debug note needs them; the gate
+        # reuses them (otherwise it builds its own, or skips them on a cache hit)
+        feats = {}
+        if ai_debug:
+            built = await asyncio.gather(*[asyncio.to_thread(build_features, scored[i]) for i in ok],
+                                         return_exceptions=True)
+            feats = {symbols[i]: f for i, f in zip(ok, built) if not isinstance(f, Exception)}
+        # AI gate: ML baseline; gray-zone symbols share one OpenAI call when enabled
+        # (see strategies/momentum_ai.py)
+        ais = await ai_momentum_gate_batch({symbols[i]: scored[i] for i in ok}, feats, return_exceptions=True)
+        for i, sig in zip(ok, sigs):
+            sym = symbols[i]
+            ai = ais[sym]
+            if isinstance(ai, Exception):
+                # A broken gate only blocks the entry: exits below need just price/levels,
+                # so the symbol stays in the loop with a failed AI result.
+                logging.error(f"{sym}: AI gate failed — no entry this cycle", exc_info=ai)
+                ai = AIResult(0.0, 0.0, False, False, f"{type(ai).__name__}: {ai}", "gate_error")
+            scored[i] = (scored[i], sig, ai, feats.get(sym))
+        return scored
+
+    scored = asyncio.run(fetch_and_score_all())
+
+    for sym, res in zip(symbols, scored):
+        if isinstance(res, Exception):
+            logging.warning(f"{sym}: no data — {type(res).__name__}: {res}")
+            continue
+        if res is None:
             logging.info(f"{sym}: no data")
             continue
-
-        # -------- SIGNALS: TA + AI --------
-        # TA gives directional bias + levels (sl/tp/price) but not size
-        sig = signal(df, **sig_params)
+        ohlcv, sig, ai, feats = res
         price = float(sig["price"])
         if verbose:
             sl = sig.get("sl"); tp = sig.get("tp")
@@ -157,34 +267,32 @@ def main():
                 if None not in (sl, tp, bo_up, bo_dn) else
                 f"{sym} TA detail | keys={list(sig.keys())}"
             )
-        # AI gate: ML baseline; optionally calls OpenAI when enabled (see strategies/momentum_ai.py)
-        ai = ai_momentum_gate(df)
 
         # Current position snapshot (if any)
-        pos = state["positions"].get(sym, {"qty": 0.0, "avg": 0.0, "sl": 0.0, "tp": 0.0, "trail_pct": 0.0})
+        pos = positions.get(sym, {"qty": 0.0, "avg": 0.0, "sl": 0.0, "tp": 0.0, "trail_pct": 0.0})
 
         # -------- VISIBILITY: features + candlestick pattern --------
-        ai_debug = str(os.getenv("AI_DEBUG", "0")).lower() in ("1", "true", "yes", "on")
         feat_note = ""
-        if ai_debug:
-            feats = build_features(df)
-            core = {k: round(float(feats.get(k, 0.0)), 4)
-                    for k in ("ema_gap_pct", "slope_20_pct", "adx14", "rsi14", "atr14_pct", "vol_rank_20")
-                    if k in feats}
+        if ai_debug and feats is not None:
+            core = {k: round(float(feats.get(k, 0.0)), 4) for k in CORE_KEYS if k in feats}
             feat_note = f"feats={core}"
 
-        # Evaluate candlestick pattern every cycle (name or 'none')
-        ok_pat, pattern_name = bullish_pattern_hit(
-            df, tuple(cfg.get("signals", {}).get("allowed_patterns",
-                                                 ["bullish_engulfing", "hammer", "morning_star"]))
-        )
-        pattern_str = pattern_name if pattern_name else "none"
+        # Entry gate (exits below don't change it: pos is this cycle's snapshot).
+        # For testing complete flow, set ALLOW_AI_ONLY=1 to ignore TA buy
+        ta_allows = bool(sig["buy"]) or allow_ai_only
+        entry_open = allow_new_entries and pos["qty"] <= 0 and ta_allows and ai.passed
+
+        # Candlestick pattern only matters for an entry, so scan only then ('n/a' otherwise)
+        ok_pat, pattern_str = False, "n/a"
+        if entry_open:
+            ok_pat, pattern_name = bullish_pattern_hit(ohlcv, allowed_patterns)
+            pattern_str = pattern_name if pattern_name else "none"
 
         # Log a compact, definitive line per symbol so you KNOW AI + patterns ran
         logging.info(
             f"{sym} @ {price:.2f} | TA buy={sig['buy']} sell={sig['sell']} | "
-            f"AI={ai['ai_score']:.1f}/{ai['ai_conf']:.0f}% pass={ai['passed']} "
-            f"use_llm={ai['use_llm']} status={ai.get('llm_status','')} | "
+            f"AI={ai.ai_score:.1f}/{ai.ai_conf:.0f}% pass={ai.passed} "
+            f"use_llm={ai.use_llm} status={ai.llm_status} | "
             f"pattern={pattern_str} | pos_qty={pos['qty']:.6f} sl={pos['sl']:.2f} tp={pos['tp']:.2f} | {feat_note}"
         )
 
@@ -192,15 +300,15 @@ def main():
         note_txt = ""
         if ai_debug:
             # status first, then rationale snippet
-            rat = ai.get("rationale","")
-            note_txt = f"status={ai.get('llm_status','')}" + (f" | {rat[:120]}" if rat else "")
+            rat = ai.rationale
+            note_txt = f"status={ai.llm_status}" + (f" | {rat[:120]}" if rat else "")
 
-        storage.append_ai_decision(
+        ai_rows.append((
             storage.now_iso(), sym, price,
-            ai["ai_score"], ai["ai_conf"], ai["passed"], ai["use_llm"],
+            ai.ai_score, ai.ai_conf, ai.passed, ai.use_llm,
             pattern_str, sig["buy"], sig["sell"],
             note_txt
-        )
+        ))
 
         # =========================================
         # EXIT MANAGEMENT (always allowed if in pos)
@@ -221,21 +329,18 @@ def main():
                     broker.market_sell(sym, qty)
                                         # --- PAPER WALLET: credit cash with proceeds ---
                     if dry:
-                        state["cash_usdt"] += qty * price
+                        state.cash_usdt += qty * price
                     # Ledgers
-                    state["realized_pnl_frac"] += pnl_frac
-                    state["day_pnl_frac"][day] = state["day_pnl_frac"].get(day, 0.0) + pnl_frac
-                    state["realized_pnl_usdt"] += pnl_usdt
-                    state["day_pnl_usdt"][day] = state["day_pnl_usdt"].get(day, 0.0) + pnl_usdt
+                    _book_pnl(state, day, pnl_frac, pnl_usdt)
 
-                    storage.append_trade(storage.now_iso(), "SELL", sym, qty, price, pnl_frac, pnl_usdt, "TP")
+                    trade_rows.append((storage.now_iso(), "SELL", sym, qty, price, pnl_frac, pnl_usdt, "TP"))
                     notify(f"🎯 TP SELL {sym} qty={qty:.6f} @ {price:.2f} | +{pnl_usdt:.2f} USDT | paper={str(dry).lower()}")
                     logging.info(f"{sym}: TP SELL qty={qty:.6f} @ {price:.2f}")
                     sells += 1
 
                 # Flat the position
-                state["positions"][sym] = {"qty": 0.0, "avg": 0.0, "sl": 0.0, "tp": 0.0, "trail_pct": 0.0}
-                state["loss_streak"] = 0
+                positions[sym] = {"qty": 0.0, "avg": 0.0, "sl": 0.0, "tp": 0.0, "trail_pct": 0.0}
+                state.loss_streak = 0
 
             # Stop Loss
             elif price <= pos["sl"]:
@@ -245,32 +350,27 @@ def main():
                     pnl_usdt = qty * (price - pos["avg"])
                     broker.market_sell(sym, qty)
 
-                    state["realized_pnl_frac"] += pnl_frac
-                    state["day_pnl_frac"][day] = state["day_pnl_frac"].get(day, 0.0) + pnl_frac
-                    state["realized_pnl_usdt"] += pnl_usdt
-                    state["day_pnl_usdt"][day] = state["day_pnl_usdt"].get(day, 0.0) + pnl_usdt
+                    _book_pnl(state, day, pnl_frac, pnl_usdt)
 
-                    storage.append_trade(storage.now_iso(), "SELL", sym, qty, price, pnl_frac, pnl_usdt, "SL")
+                    trade_rows.append((storage.now_iso(), "SELL", sym, qty, price, pnl_frac, pnl_usdt, "SL"))
                     notify(f"🛑 SL SELL {sym} qty={qty:.6f} @ {price:.2f} | {pnl_usdt:.2f} USDT | paper={str(dry).lower()}")
                     logging.info(f"{sym}: SL SELL qty={qty:.6f} @ {price:.2f}")
                     sells += 1
 
                     # Track loss streak for future adaptive risk if wanted
                     if pnl_usdt < 0:
-                        state["loss_streak"] = state.get("loss_streak", 0) + 1
+                        state.loss_streak += 1
                     else:
-                        state["loss_streak"] = 0
+                        state.loss_streak = 0
 
-                state["positions"][sym] = {"qty": 0.0, "avg": 0.0, "sl": 0.0, "tp": 0.0, "trail_pct": 0.0}
+                positions[sym] = {"qty": 0.0, "avg": 0.0, "sl": 0.0, "tp": 0.0, "trail_pct": 0.0}
 
             # else: HOLD (waiting for TP/SL)
 
         # =========================================
         # ENTRY (gated): TA buy + AI pass + (optional) pattern
         # =========================================
-        # For testing complete flow, set ALLOW_AI_ONLY=1 to ignore TA buy
-        ta_allows = bool(sig["buy"]) or allow_ai_only
-        if allow_new_entries and pos["qty"] <= 0 and ta_allows and ai["passed"]:
+        if entry_open:
             # Enforce pattern only if configured
             require_pat = cfg.get("signals", {}).get("require_bullish_pattern", True)
             if require_pat and not ok_pat:
@@ -282,13 +382,13 @@ def main():
                 cost = qty * price
                 # --- PAPER WALLET: require cash ---
                 if dry:
-                    if state["cash_usdt"] < cost:
-                        logging.info(f"{sym}: skip BUY — insufficient cash (need {cost:.2f}, have {state['cash_usdt']:.2f})")
+                    if state.cash_usdt < cost:
+                        logging.info(f"{sym}: skip BUY — insufficient cash (need {cost:.2f}, have {state.cash_usdt:.2f})")
                         continue
-                    state["cash_usdt"] -= cost
+                    state.cash_usdt -= cost
 
                 broker.market_buy(sym, qty)
-                state["positions"][sym] = {
+                positions[sym] = {
                     "qty": qty,
                     "avg": price,
                     "sl": float(sig["sl"]),
@@ -297,42 +397,49 @@ def main():
                     "opened_ts": storage.now_iso(),
                 }
 
-                note = f"AI {ai['ai_score']:.1f}/{ai['ai_conf']:.0f}%"
-                storage.append_trade(storage.now_iso(), "BUY", sym, qty, price, None, None, note)
+                note = f"AI {ai.ai_score:.1f}/{ai.ai_conf:.0f}%"
+                trade_rows.append((storage.now_iso(), "BUY", sym, qty, price, None, None, note))
                 notify(
                     f"✅ BUY {sym} qty={qty:.6f} @ {price:.2f} | "
-                    f"AI {ai['ai_score']:.1f}/{ai['ai_conf']:.0f}% "
-                    f"{'(LLM)' if ai['use_llm'] else '(ML)'} | paper={str(dry).lower()}"
+                    f"AI {ai.ai_score:.1f}/{ai.ai_conf:.0f}% "
+                    f"{'(LLM)' if ai.use_llm else '(ML)'} | paper={str(dry).lower()}"
                 )
                 logging.info(f"{sym}: BUY qty={qty:.6f} @ {price:.2f}")
                 buys += 1
 
+    storage.append_trade_batch(trade_rows)
+    storage.append_ai_decision_batch(ai_rows)
+
     # ------------------------------
     # Equity snapshot (realized-only proxy). Mark-to-market can be added later.
     # ------------------------------
     # --- MTM EQUITY: cash + market value of all open positions ---
     deposits = storage.total_deposits(state)
-    cash = float(state.get("cash_usdt", 0.0))
+    cash = float(state.cash_usdt or 0.0)
 
     # recompute per-symbol last price for valuation (we already have 'price' for the last processed symbol only)
     # so quickly reload prices for symbols we track positions in
-    mkt_value = 0.0
-    for _sym, p in state.get("positions", {}).items():
-        if p.get("qty", 0.0) > 0:
-            try:
-                _df = load_ohlcv(_sym, timeframe, limit=2, exchange=exchange, testnet=True)
-                _px = float(_df["close"].iloc[-1]) if _df is not None and len(_df) else float(p["avg"])
-            except Exception:
-                _px = float(p["avg"])
-            mkt_value += float(p["qty"]) * _px
+    open_pos = [(_sym, p) for _sym, p in positions.items() if p.get("qty", 0.0) > 0]
+    mtm_px = []
+    for _sym, p in open_pos:
+        try:
+            _df = load_ohlcv(_sym, timeframe, limit=2, exchange=exchange, testnet=True, client=data_client)
+            mtm_px.append(float(_df["close"].iloc[-1]) if _df is not None and len(_df) else float(p["avg"]))
+        except Exception:
+            mtm_px.append(float(p["avg"]))
+    # whole book valued in one vector op
+    mkt_value = market_value([float(p["qty"]) for _, p in open_pos], mtm_px)
 
     equity_mtm = cash + mkt_value
     # for backward compatibility, keep realized frac, but note is now mtm
-    storage.append_equity(storage.now_iso(), equity_mtm, deposits, state.get("realized_pnl_frac", 0.0), "mtm")
-    storage.write_state(state)
+    storage.append_equity(storage.now_iso(), equity_mtm, deposits, state.realized_pnl_frac, "mtm")
+    state.ai_cache = export_gate_cache()
+    storage.mark_dirty()
+    storage.flush_state()
+    storage.flush_logs()
 
     # Human-friendly heartbeat/summary (also to Telegram if enabled)
-    pnl_today = float(state["day_pnl_usdt"].get(day, 0.0))
+    pnl_today = float(day_pnl_usdt.get(day, 0.0))
     summary = (
         f"Processed {len(symbols)} symbols | buys={buys} sells={sells} | "
         f"cash={cash:.2f} | mkt_value={mkt_value:.2f} | equity_mtm={equity_mtm:.2f} | "
@@ -344,4 +451,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # kill -HUP <pid>: re-read AI gate env (cutoffs, USE_OPENAI, ...) without a restart
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: reload_config())
     main()
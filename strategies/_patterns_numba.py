@@ -0,0 +1,48 @@
+"""
+Compiled candlestick predicates for strategies.patterns.
+Each *_at kernel tests the pattern ending at bar i on raw float64 OHLC arrays
+(same rules as the pandas versions); pattern_masks scans every bar at once.
+Without numba they run as plain Python (utils._njit fallback).
+"""
+import numpy as np
+
+from utils._njit import njit, prange
+
+
+@njit(cache=True)
+def engulf_at(o, h, l, c, i):
+    # red then green fully engulfs
+    return (c[i-1] < o[i-1]) and (c[i] > o[i]) and (c[i] >= o[i-1]) and (o[i] <= c[i-1])
+
+@njit(cache=True)
+def hammer_at(o, h, l, c, i):
+    body = abs(c[i] - o[i])
+    upper = h[i] - max(c[i], o[i])
+    lower = min(c[i], o[i]) - l[i]
+    rng = h[i] - l[i]
+    total = rng if rng > 0 else 1e-9
+    return (c[i] > o[i]*0.995) and (lower >= 2*body) and (upper <= body) and (body/total <= 0.35)
+
+@njit(cache=True)
+def morning_star_at(o, h, l, c, i):
+    # red big body, small indecision, then strong green close into red's body
+    o1 = o[i-2]; c1 = c[i-2]
+    cond1 = (c1 < o1) and (abs(c1 - o1) > (h[i-2] - l[i-2]) * 0.4)
+    cond2 = abs(c[i-1] - o[i-1]) < (h[i-1] - l[i-1]) * 0.2
+    cond3 = (c[i] > o[i]) and (c[i] > (o1 - (o1 - c1)*0.5))  # closes into prior red body
+    return cond1 and cond2 and cond3
+
+@njit(cache=True, parallel=True)
+def pattern_masks(o, h, l, c):
+    # per-bar hits: (bullish_engulfing, hammer, morning_star); False where history is too short
+    n = c.shape[0]
+    eng = np.zeros(n, dtype=np.bool_)
+    ham = np.zeros(n, dtype=np.bool_)
+    star = np.zeros(n, dtype=np.bool_)
+    for i in prange(n):
+        ham[i] = hammer_at(o, h, l, c, i)
+        if i >= 1:
+            eng[i] = engulf_at(o, h, l, c, i)
+        if i >= 2:
+            star[i] = morning_star_at(o, h, l, c, i)
+    return eng, ham, star
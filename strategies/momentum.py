@@ -1,22 +1,189 @@
+import numpy as np
 import pandas as pd
 
+from utils._njit import njit, prange, HAVE_NUMBA
+from utils.ohlcv import OHLCV
+
+@njit(cache=True)
+def _rolling_mean_nb(x, w):
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    s = 0.0
+    for i in range(n):
+        s += x[i]
+        if i >= w:
+            s -= x[i - w]
+        if i >= w - 1:
+            out[i] = s / w
+    return out
+
+@njit(cache=True)
+def _rolling_extreme_nb(x, w, want_max):
+    # monotonic deque of indices (values decreasing for max, increasing for min);
+    # every index is pushed once, so a flat buffer with head/tail pointers suffices
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    dq = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+    for i in range(n):
+        v = x[i]
+        if want_max:
+            while tail > head and x[dq[tail - 1]] <= v:
+                tail -= 1
+        else:
+            while tail > head and x[dq[tail - 1]] >= v:
+                tail -= 1
+        dq[tail] = i
+        tail += 1
+        if dq[head] <= i - w:
+            head += 1
+        if i >= w - 1:
+            out[i] = x[dq[head]]
+    return out
+
+@njit(cache=True, fastmath=True)
+def _compute_indicators_nb(high, low, close, ls, ll, atr_len, bo_len):
+    short = _rolling_mean_nb(close, ls)
+    long = _rolling_mean_nb(close, ll)
+    atr = _rolling_mean_nb(high - low, atr_len)
+    breakout_up = _rolling_extreme_nb(high, bo_len, True)
+    breakout_dn = _rolling_extreme_nb(low, bo_len, False)
+    return short, long, atr, breakout_up, breakout_dn
+
 def compute_indicators(df: pd.DataFrame, lookback_short=20, lookback_long=50, atr_len=14, breakout_len=20):
+    # full-length float arrays aligned with df rows (NaN during warmup)
+    if HAVE_NUMBA:
+        # one compiled pass per indicator over raw arrays
+        return _compute_indicators_nb(
+            df["high"].to_numpy(dtype=np.float64), df["low"].to_numpy(dtype=np.float64),
+            df["close"].to_numpy(dtype=np.float64),
+            int(lookback_short), int(lookback_long), int(atr_len), int(breakout_len),
+        )
     high, low, close = df["high"], df["low"], df["close"]
-    short = close.rolling(lookback_short).mean()
-    long = close.rolling(lookback_long).mean()
+    short = close.rolling(lookback_short).mean().to_numpy()
+    long = close.rolling(lookback_long).mean().to_numpy()
     tr = (high - low)
-    atr = tr.rolling(atr_len).mean()
-    breakout_up = high.rolling(breakout_len).max()
-    breakout_dn = low.rolling(breakout_len).min()
+    atr = tr.rolling(atr_len).mean().to_numpy()
+    breakout_up = high.rolling(breakout_len).max().to_numpy()
+    breakout_dn = low.rolling(breakout_len).min().to_numpy()
     return short, long, atr, breakout_up, breakout_dn
 
 def signal(df: pd.DataFrame, **kw):
+    """
+    TA signal for the last bar of df.
+    Read-only: df is never mutated, so a view such as df.iloc[:i] can be passed without .copy().
+    """
     short,long,atr,bo_up,bo_dn = compute_indicators(df, **kw)
-    last = df.index[-1]
-    mom = short.iloc[-1] - long.iloc[-1]
+    mom = short[-1] - long[-1]
     price = df["close"].iloc[-1]
-    buy  = bool(mom > 0 and price > bo_up.iloc[-2])
-    sell = bool(mom < 0 and price < bo_dn.iloc[-2])
-    sl   = float(price - 2*atr.iloc[-1])
-    tp   = float(price + 3*atr.iloc[-1])
+    buy  = bool(mom > 0 and price > bo_up[-2])
+    sell = bool(mom < 0 and price < bo_dn[-2])
+    sl   = float(price - 2*atr[-1])
+    tp   = float(price + 3*atr[-1])
     return {"buy": buy, "sell": sell, "sl": sl, "tp": tp, "price": float(price)}
+
+def signal_fast(data, lookback_short=20, lookback_long=50, atr_len=14, breakout_len=20):
+    """
+    signal() reading only the tail windows it needs (O(window) instead of
+    full rolling series). `data` is a DataFrame or a utils.ohlcv.OHLCV of arrays.
+    A window without enough history is NaN, exactly like the rolling warmup.
+    """
+    if isinstance(data, OHLCV):
+        c, h, l = data.c, data.h, data.l
+    else:
+        c = data["close"].to_numpy(dtype=np.float64)
+        h = data["high"].to_numpy(dtype=np.float64)
+        l = data["low"].to_numpy(dtype=np.float64)
+    ls, ll, al, bl = int(lookback_short), int(lookback_long), int(atr_len), int(breakout_len)
+    n = c.shape[0]
+    nan = np.nan
+    short = c[-ls:].mean() if n >= ls else nan
+    long = c[-ll:].mean() if n >= ll else nan
+    atr = (h[-al:] - l[-al:]).mean() if n >= al else nan
+    bo_up = h[-bl-1:-1].max() if n >= bl + 1 else nan
+    bo_dn = l[-bl-1:-1].min() if n >= bl + 1 else nan
+    mom = short - long
+    price = c[-1]
+    buy  = bool(mom > 0 and price > bo_up)
+    sell = bool(mom < 0 and price < bo_dn)
+    return {"buy": buy, "sell": sell, "sl": float(price - 2*atr), "tp": float(price + 3*atr), "price": float(price)}
+
+@njit(cache=True, parallel=True)
+def _batch_signal_nb(H, L, C, n, ls, ll, al, bl):
+    # rows are symbols, right-aligned in the last W columns; n[s] = real bar count
+    # (a window longer than n[s] is NaN, same as the rolling warmup)
+    N, W = C.shape
+    buy = np.zeros(N, dtype=np.bool_)
+    sell = np.zeros(N, dtype=np.bool_)
+    sl = np.full(N, np.nan)
+    tp = np.full(N, np.nan)
+    price = np.full(N, np.nan)
+    for s in prange(N):
+        px = C[s, W - 1]
+        price[s] = px
+        atr = np.nan
+        if n[s] >= al:
+            acc = 0.0
+            for j in range(W - al, W):
+                acc += H[s, j] - L[s, j]
+            atr = acc / al
+        sl[s] = px - 2 * atr
+        tp[s] = px + 3 * atr
+        if n[s] < ls or n[s] < ll or n[s] < bl + 1:
+            continue
+        short = 0.0
+        for j in range(W - ls, W):
+            short += C[s, j]
+        long = 0.0
+        for j in range(W - ll, W):
+            long += C[s, j]
+        mom = short / ls - long / ll
+        bo_up = H[s, W - bl - 1]
+        bo_dn = L[s, W - bl - 1]
+        for j in range(W - bl, W - 1):
+            bo_up = max(bo_up, H[s, j])
+            bo_dn = min(bo_dn, L[s, j])
+        buy[s] = mom > 0 and px > bo_up
+        sell[s] = mom < 0 and px < bo_dn
+    return buy, sell, sl, tp, price
+
+def signal_batch(ohlcvs, lookback_short=20, lookback_long=50, atr_len=14, breakout_len=20):
+    """
+    signal_fast() for many symbols at once -> list of signal dicts (input order).
+    With numba, the tail windows of all symbols are stacked into (N, W) float64
+    matrices and scored in one parallel kernel; otherwise it loops signal_fast.
+    """
+    kw = dict(lookback_short=lookback_short, lookback_long=lookback_long,
+              atr_len=atr_len, breakout_len=breakout_len)
+    if not HAVE_NUMBA or not ohlcvs:
+        return [signal_fast(o, **kw) for o in ohlcvs]
+    ls, ll, al, bl = int(lookback_short), int(lookback_long), int(atr_len), int(breakout_len)
+    W = max(ls, ll, al, bl + 1)
+    N = len(ohlcvs)
+    H = np.zeros((N, W)); L = np.zeros((N, W)); C = np.zeros((N, W))
+    n = np.empty(N, dtype=np.int64)
+    for i, o in enumerate(ohlcvs):
+        k = min(W, len(o.c))
+        n[i] = len(o.c)
+        H[i, W - k:] = o.h[-k:]; L[i, W - k:] = o.l[-k:]; C[i, W - k:] = o.c[-k:]
+    buy, sell, sl, tp, price = _batch_signal_nb(H, L, C, n, ls, ll, al, bl)
+    return [
+        {"buy": bool(buy[i]), "sell": bool(sell[i]), "sl": float(sl[i]), "tp": float(tp[i]), "price": float(price[i])}
+        for i in range(N)
+    ]
+
+def signal_series(df: pd.DataFrame, **kw):
+    """
+    Vectorized signal(): buy/sell masks for every bar at once.
+    buy[i] equals signal(df.iloc[:i+1])["buy"] (same for sell).
+    """
+    short,long,atr,bo_up,bo_dn = compute_indicators(df, **kw)
+    close = df["close"].to_numpy()
+    mom = short - long
+    prev_up = np.r_[np.nan, bo_up[:-1]]
+    prev_dn = np.r_[np.nan, bo_dn[:-1]]
+    with np.errstate(invalid="ignore"):
+        buy = (mom > 0) & (close > prev_up)
+        sell = (mom < 0) & (close < prev_dn)
+    return buy, sell
@@ -1,26 +1,42 @@
 # strategies/momentum_ai.py
-import os, requests, re
+import os, re, time, asyncio, threading
+from dataclasses import dataclass
+
+import requests
 
 from ai.feature_engineering import build_features  # returns dict of numeric features
+from utils.ohlcv import OHLCV
+from utils import _json
+from utils.http import shared_session
+
+try:
+    import diskcache  # optional: LLM scores survive restarts (LLM_CACHE_DIR)
+except ImportError:
+    diskcache = None
+
+_GATE_CACHE = {}  # "sym|last_ts|last_close" -> raw gate inputs (insertion order = FIFO)
+_GATE_CACHE_MAX = 256
+_GATE_LOCK = threading.Lock()  # gate may run in worker threads (run_bot)
+_SCORE_RE = re.compile(r'(\d{1,3})')
+_LLM_TTL_S = 900      # an LLM score stays valid for similar features this long
+_LLM_MEM = {}         # key -> (expires_at, llm) when diskcache is not installed
+_LLM_MEM_MAX = 4096
+_LLM_DISK = None
+
+# Features shown to the LLM (and in run_bot's AI_DEBUG note)
+CORE_KEYS = ("ema_gap_pct","slope_20_pct","adx14","rsi14","atr14_pct","vol_rank_20")
 
 def _ml_score(feats):
-    # Simple deterministic scorer so we always have a number even without LLM
-    w = {
-        "ema_gap_pct":  35.0,
-        "slope_20_pct": 25.0,
-        "adx14":        15.0,
-        "rsi14":         5.0,
-        "vol_rank_20":  10.0,
-        "atr14_pct":    10.0,
-    }
-    s  = 0.0
-    s += w["ema_gap_pct"]  * max(-1.0, min(1.0, feats.get("ema_gap_pct", 0.0)/1.5))
-    s += w["slope_20_pct"] * max(-1.0, min(1.0, feats.get("slope_20_pct", 0.0)/1.0))
-    s += w["adx14"]        * (max(0.0, min(50.0, feats.get("adx14", 0.0)))/50.0)
-    rsi = feats.get("rsi14", 50.0)
-    s += w["rsi14"] * (1.0 - abs(50.0 - rsi)/50.0)
-    s += w["vol_rank_20"] * (max(0.0, min(100.0, feats.get("vol_rank_20", 50.0)))/100.0)
-    s += w["atr14_pct"] * (1.0 - max(0.0, min(2.0, feats.get("atr14_pct", 0.5)))/2.0)
+    # Simple deterministic scorer so we always have a number even without LLM.
+    # Weights inlined (ema gap 35, slope 25, adx 15, rsi 5, vol rank 10, atr 10):
+    # one expression, no per-call weight dict; same summation order as before.
+    g = feats.get
+    s = (35.0 * max(-1.0, min(1.0, g("ema_gap_pct", 0.0)/1.5))
+         + 25.0 * max(-1.0, min(1.0, g("slope_20_pct", 0.0)))
+         + 15.0 * (max(0.0, min(50.0, g("adx14", 0.0)))/50.0)
+         + 5.0 * (1.0 - abs(50.0 - g("rsi14", 50.0))/50.0)
+         + 10.0 * (max(0.0, min(100.0, g("vol_rank_20", 50.0)))/100.0)
+         + 10.0 * (1.0 - max(0.0, min(2.0, g("atr14_pct", 0.5)))/2.0))
     return max(0.0, min(100.0, s))
 
 def _normalize_openai_url():
@@ -31,6 +47,7 @@ def _normalize_openai_url():
       - https://api.openai.com/v1 -> append /chat/completions
       - full /v1/chat/completions -> use as-is
       - Azure/OpenRouter-compatible base URLs -> append /chat/completions if they end with /v1
+    Resolved once into _OPENAI_URL; call refresh_openai_url() after changing the env.
     """
     base = os.getenv("OPENAI_BASE_URL", "").rstrip("/")
     if not base:
@@ -48,95 +65,382 @@ def _normalize_openai_url():
     # best effort: assume base wants /v1/chat/completions
     return base + "/v1/chat/completions"
 
-def _openai_call(prompt):
+def refresh_openai_url():
+    """Re-resolve OPENAI_BASE_URL into _OPENAI_URL (None if it isn't an http(s) URL)."""
+    global _OPENAI_URL
+    url = _normalize_openai_url()
+    _OPENAI_URL = url if url.startswith("http") else None
+
+_OPENAI_URL = None
+refresh_openai_url()
+
+def _openai_request(prompt, max_tokens=200, json_mode=False):
+    # (url, headers, body) for one chat completion, or (None, status, None) if not callable
     key = os.getenv("OPENAI_API_KEY", "")
     if not key:
-        return None, "no_key"
+        return None, "no_key", None
 
-    url = _normalize_openai_url()
-    if not url.startswith("http"):
-        return None, "bad_url"
+    url = _OPENAI_URL
+    if url is None:
+        return None, "bad_url", None
 
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    payload = {
+        "model": model,
+        "messages": [
+            {"role":"system","content":"You score crypto long entries 0..100 and explain briefly."},
+            {"role":"user","content": prompt}
+        ],
+        "temperature": 0.2,
+        "max_tokens": max_tokens
+    }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    return url, {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}, _json.dumps(payload)
+
+# Bump when _gate_prompt / the batch prompt change meaning: it is part of the LLM cache key
+_PROMPT_VERSION = 1
+
+def _gate_prompt(core):
+    return f"Features={core}. Score a long entry 0..100 and explain in one sentence. Reply like '72 Reason: ...'."
 
+def _parse_openai_reply(raw):
+    data = _json.loads(raw)
+    txt = data.get("choices",[{}])[0].get("message",{}).get("content","").strip()
+    head = txt.split(maxsplit=1)[0] if txt else ""
+    if head.isdigit():
+        score = float(head)  # well-formed "72 Reason: ..." skips the regex
+    else:
+        m = _SCORE_RE.search(txt)
+        score = float(m.group(1)) if m else None
+    if score is not None:
+        score = max(0.0, min(100.0, score))
+    return ({"score": score, "rationale": txt}, "ok") if score is not None else (None, "parse_err")
+
+def _openai_call(prompt):
+    url, headers, body = _openai_request(prompt)
+    if url is None:
+        return None, headers  # status
     try:
-        r = requests.post(
-            url,
-            headers={"Authorization": f"Bearer {key}"},
-            json={
-                "model": model,
-                "messages": [
-                    {"role":"system","content":"You score crypto long entries 0..100 and explain briefly."},
-                    {"role":"user","content": prompt}
-                ],
-                "temperature": 0.2,
-                "max_tokens": 200
-            },
-            timeout=25
-        )
+        r = shared_session().post(url, headers=headers, data=body, timeout=25)
         if r.status_code >= 400:
             return None, f"http_{r.status_code}"
-        data = r.json()
-        txt = data.get("choices",[{}])[0].get("message",{}).get("content","").strip()
-        m = re.search(r'(\d{1,3})', txt)
-        score = float(m.group(1)) if m else None
-        if score is not None:
-            score = max(0.0, min(100.0, score))
-        return ({"score": score, "rationale": txt}, "ok") if score is not None else (None, "parse_err")
+        return _parse_openai_reply(r.content)
     except requests.exceptions.Timeout:
         return None, "timeout"
     except Exception:
         return None, "error"
 
-def ai_momentum_gate(df):
+async def _openai_call_async(http, prompt):
+    # _openai_call over a shared aiohttp session (same statuses)
+    url, headers, body = _openai_request(prompt)
+    if url is None:
+        return None, headers
+    try:
+        async with http.post(url, headers=headers, data=body) as r:
+            if r.status >= 400:
+                return None, f"http_{r.status}"
+            return _parse_openai_reply(await r.read())
+    except asyncio.TimeoutError:
+        return None, "timeout"
+    except Exception:
+        return None, "error"
+
+def _parse_openai_batch(raw, n):
+    # {"scores": [{"score": 72, "reason": "..."}, ...]} -> n (llm, status) pairs, or None
+    data = _json.loads(raw)
+    txt = data.get("choices",[{}])[0].get("message",{}).get("content","").strip()
+    scores = _json.loads(txt)["scores"]
+    if not isinstance(scores, list) or len(scores) != n:
+        return None
+    out = []
+    for item in scores:
+        if isinstance(item, dict):
+            score, reason = item.get("score"), str(item.get("reason", ""))
+        else:
+            score, reason = item, ""
+        if isinstance(score, bool) or not isinstance(score, (int, float)):
+            return None
+        score = max(0.0, min(100.0, float(score)))
+        out.append(({"score": score, "rationale": f"{score:g} Reason: {reason}" if reason else f"{score:g}"}, "ok"))
+    return out
+
+async def _openai_call_batch(http, cores):
     """
-    Returns:
-      {
-        "ai_score": float(0..100),
-        "ai_conf": float(0..100),
-        "passed": bool,
-        "use_llm": bool,         # TRUE only if an LLM call actually succeeded
-        "rationale": str,        # short reason from LLM (when available)
-        "llm_status": str        # 'ok','skipped','no_key','bad_url','http_XXX','timeout','error','parse_err'
-      }
-    Env:
-      USE_OPENAI=1          -> allow LLM usage
-      AI_FORCE_LLM=1        -> force LLM call every cycle (for testing)
-      AI_SCORE_PASS=65
-      AI_CONF_PASS=60
+    Score several feature dicts with one chat completion (JSON mode).
+    Returns one (llm, status) per entry in order. Transport failures (HTTP
+    error, timeout, no key) give every entry that status: retrying per symbol
+    would only multiply the calls against a rate-limited or down endpoint.
+    Returns None only when the reply arrived but can't be parsed, so the caller
+    can fall back to per-symbol prompts.
+    """
+    n = len(cores)
+    prompt = (f"Features={_json.dumps(list(cores)).decode()}. Score each entry as a long entry "
+              f"0..100 with a one-sentence reason. Reply with a JSON object "
+              f'{{"scores": [{{"score": 72, "reason": "..."}}, ...]}} with one item per entry, in order.')
+    url, headers, body = _openai_request(prompt, max_tokens=200*n, json_mode=True)
+    if url is None:
+        return [(None, headers)] * n  # status
+    try:
+        async with http.post(url, headers=headers, data=body) as r:
+            if r.status >= 400:
+                return [(None, f"http_{r.status}")] * n
+            raw = await r.read()
+    except asyncio.TimeoutError:
+        return [(None, "timeout")] * n
+    except Exception:
+        return [(None, "error")] * n
+    try:
+        return _parse_openai_batch(raw, n)
+    except Exception:
+        return None
+
+# LLM score cache: CORE_KEYS features snapped to a coarse grid, so bar-to-bar noise
+# (RSI 55.2 -> 55.4) maps to the same prompt and reuses the last answer
+_LLM_GRID = {"ema_gap_pct": 0.1, "slope_20_pct": 0.1, "adx14": 1.0,
+             "rsi14": 1.0, "atr14_pct": 0.05, "vol_rank_20": 5.0}
+
+def _llm_key(core):
+    # model + prompt version first: a new model or prompt never reuses old scores
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    return f"gate|{model}|p{_PROMPT_VERSION}|" + "|".join(
+        f"{round(core.get(k, 0.0) / _LLM_GRID[k]):d}" for k in CORE_KEYS)
+
+def _llm_disk():
+    global _LLM_DISK
+    if diskcache is None:
+        return None
+    if _LLM_DISK is None:
+        _LLM_DISK = diskcache.Cache(os.path.expanduser(os.getenv("LLM_CACHE_DIR", "~/.cache/cryptobot_llm")))
+    return _LLM_DISK
+
+def _llm_cache_get(core):
+    # a broken cache (diskcache I/O, locked sqlite) is just a miss: the LLM call still runs
+    key = _llm_key(core)
+    disk = _llm_disk()
+    if disk is not None:
+        try:
+            return disk.get(key)
+        except Exception:
+            return None
+    hit = _LLM_MEM.get(key)
+    if hit is None or hit[0] < time.monotonic():
+        return None
+    return hit[1]
+
+def _llm_cache_put(core, llm):
+    key = _llm_key(core)
+    disk = _llm_disk()
+    if disk is not None:
+        try:
+            disk.set(key, dict(llm), expire=_LLM_TTL_S)
+        except Exception:
+            pass  # not cached; the score itself is still used
+        return
+    with _GATE_LOCK:
+        _LLM_MEM.pop(key, None)
+        _LLM_MEM[key] = (time.monotonic() + _LLM_TTL_S, dict(llm))
+        while len(_LLM_MEM) > _LLM_MEM_MAX:
+            del _LLM_MEM[next(iter(_LLM_MEM))]
+
+def _gate_key(symbol, df):
+    # last bar is still forming, so its close is part of the key
+    if isinstance(df, OHLCV):
+        return f"{symbol}|{int(df.ts[-1])}|{float(df.c[-1])!r}"
+    ts = df["ts"].iloc[-1] if "ts" in df else df.index[-1]
+    return f"{symbol}|{getattr(ts, 'value', ts)}|{float(df['close'].iloc[-1])!r}"
+
+def _gate_cache_put(key, entry):
+    with _GATE_LOCK:
+        _GATE_CACHE.pop(key, None)
+        _GATE_CACHE[key] = dict(entry)
+        while len(_GATE_CACHE) > _GATE_CACHE_MAX:
+            del _GATE_CACHE[next(iter(_GATE_CACHE))]
+
+def export_gate_cache():
+    """Snapshot of the gate cache for state["ai_cache"] (JSON-serializable)."""
+    with _GATE_LOCK:
+        return {k: dict(v) for k, v in _GATE_CACHE.items()}
+
+def load_gate_cache(cache):
+    """Seed the gate cache from state["ai_cache"] written by a previous run."""
+    for k, v in (cache or {}).items():
+        if isinstance(v, dict) and "ml" in v and "conf" in v:
+            _gate_cache_put(k, v)
+
+@dataclass(slots=True)
+class AIResult:
+    ai_score: float        # 0..100
+    ai_conf: float         # 0..100
+    passed: bool
+    use_llm: bool          # TRUE only if an LLM call actually succeeded
+    rationale: str = ""    # short reason from LLM (when available)
+    llm_status: str = ""   # 'ok','cached','skipped','gate_error' (run_bot),'no_key','bad_url','http_XXX','timeout','error','parse_err'
+
+def _gate_result(ml, conf, used_llm, rationale, llm_status, pass_cut, conf_cut):
+    return AIResult(
+        ai_score=round(ml,1),
+        ai_conf=round(conf,0),
+        passed=(ml >= pass_cut) and (conf >= conf_cut),
+        use_llm=used_llm,
+        rationale=rationale,
+        llm_status=llm_status,
+    )
+
+def _llm_needed(ml, allow_llm, force_llm):
+    # Only attempt LLM if allowed and either forced, or ML is in a gray zone
+    return allow_llm and (force_llm or 45.0 < ml < 75.0)
+
+def _env_flag(name):
+    return str(os.getenv(name, "0")).lower() in ("1","true","yes","on")
+
+@dataclass(slots=True, frozen=True)
+class _GateCfg:
+    pass_cut: float
+    conf_cut: float
+    allow_llm: bool
+    force_llm: bool
+
+def _load_cfg():
+    return _GateCfg(
+        pass_cut=float(os.getenv("AI_SCORE_PASS", "65")),
+        conf_cut=float(os.getenv("AI_CONF_PASS", "60")),
+        allow_llm=_env_flag("USE_OPENAI"),
+        force_llm=_env_flag("AI_FORCE_LLM"),
+    )
+
+_CFG = _load_cfg()   # gate env, parsed once; see reload_config()
+
+def reload_config():
+    """Re-read the gate env vars (cutoffs, USE_OPENAI, AI_FORCE_LLM) and the OpenAI URL."""
+    global _CFG
+    _CFG = _load_cfg()
+    refresh_openai_url()
+
+def _gate_prepare(df, symbol, feats, cfg):
+    """
+    Everything before the LLM: (key, result, ml, conf, core). `result` is set
+    when the gate is already decided (cache hit, or LLM not needed); otherwise
+    `core` holds the features for the LLM prompt and _gate_finish completes it.
     """
-    feats = build_features(df)
+    pass_cut, conf_cut = cfg.pass_cut, cfg.conf_cut
+    allow_llm, force_llm = cfg.allow_llm, cfg.force_llm
+
+    key = _gate_key(symbol, df) if symbol else None
+    # AI_FORCE_LLM means "ask the model every run": never answer from the gate cache
+    hit = _GATE_CACHE.get(key) if key and not force_llm else None
+    if hit is not None and hit.get("llm_status") == "skipped" and _llm_needed(hit["ml"], allow_llm, force_llm):
+        hit = None  # cached without LLM, but this run would call it
+    if hit is not None:
+        res = _gate_result(hit["ml"], hit["conf"], hit.get("use_llm", False), hit.get("rationale", ""),
+                           hit.get("llm_status", "skipped"), pass_cut, conf_cut)
+        return key, res, hit["ml"], hit["conf"], None
+
+    if feats is None:
+        feats = build_features(df)
     ml = _ml_score(feats)
     conf = 60.0 + 0.4*abs(ml-50.0)
 
-    allow_llm = str(os.getenv("USE_OPENAI","0")).lower() in ("1","true","yes","on")
-    force_llm = str(os.getenv("AI_FORCE_LLM","0")).lower() in ("1","true","yes","on")
+    # Decisive ML score (or LLM off): done, no prompt is built
+    if not _llm_needed(ml, allow_llm, force_llm):
+        if key:
+            _gate_cache_put(key, {"ml": ml, "conf": conf, "use_llm": False,
+                                  "rationale": "", "llm_status": "skipped"})
+        return key, _gate_result(ml, conf, False, "", "skipped", pass_cut, conf_cut), ml, conf, None
+
+    core = {k: round(float(feats.get(k,0.0)), 4) for k in CORE_KEYS}
+    return key, None, ml, conf, core
 
+def _gate_finish(key, ml, conf, llm, llm_status, cfg):
     used_llm = False
     rationale = ""
-    llm_status = "skipped"
+    if llm and llm.get("score") is not None:
+        ml = float(llm["score"])
+        rationale = llm.get("rationale","")
+        used_llm = True
+        conf = 70.0 + 0.3*abs(ml-50.0)
 
-    # Only attempt LLM if allowed and either forced, or ML is in a gray zone
-    if allow_llm and (force_llm or 45.0 < ml < 75.0):
-        core = {k: round(float(feats.get(k,0.0)), 4) for k in ("ema_gap_pct","slope_20_pct","adx14","rsi14","atr14_pct","vol_rank_20")}
-        llm, llm_status = _openai_call(
-            f"Features={core}. Score a long entry 0..100 and explain in one sentence. Reply like '72 Reason: ...'."
-        )
-        if llm and llm.get("score") is not None:
-            ml = float(llm["score"])
-            rationale = llm.get("rationale","")
-            used_llm = True
-            conf = 70.0 + 0.3*abs(ml-50.0)
-
-    pass_cut = float(os.getenv("AI_SCORE_PASS", "65"))
-    conf_cut = float(os.getenv("AI_CONF_PASS", "60"))
-    passed = (ml >= pass_cut) and (conf >= conf_cut)
-
-    return {
-        "ai_score": round(ml,1),
-        "ai_conf": round(conf,0),
-        "passed": passed,
-        "use_llm": used_llm,       # TRUE only on successful call
-        "rationale": rationale,
-        "llm_status": llm_status,
-    }
+    if key and llm_status in ("ok", "cached"):
+        _gate_cache_put(key, {"ml": ml, "conf": conf, "use_llm": used_llm,
+                              "rationale": rationale, "llm_status": llm_status})
+    return _gate_result(ml, conf, used_llm, rationale, llm_status, cfg.pass_cut, cfg.conf_cut)
+
+def ai_momentum_gate(df, symbol=None, feats=None):
+    """
+    Returns an AIResult (ai_score, ai_conf, passed, use_llm, rationale, llm_status).
+    Env (read at import; reload_config() re-reads it, run_bot does so on SIGHUP):
+      USE_OPENAI=1          -> allow LLM usage
+      AI_FORCE_LLM=1        -> force LLM call every cycle (for testing)
+      AI_SCORE_PASS=65
+      AI_CONF_PASS=60
+    With `symbol`, results are memoized on (symbol, last bar ts, last close), so a
+    re-run on unchanged data skips the features and the LLM call; failed LLM calls
+    are not cached. LLM scores are also cached for 15 min on the core features
+    snapped to a coarse grid plus OPENAI_MODEL and the prompt version (diskcache
+    under LLM_CACHE_DIR, else in-process); such hits report llm_status='cached'.
+    AI_FORCE_LLM skips both caches (every call goes to the API).
+    `passed` is always re-evaluated against the current cutoffs.
+    `feats` may carry build_features(df) already computed by the caller.
+    `df` may also be a utils.ohlcv.OHLCV of arrays.
+    """
+    cfg = _CFG
+    key, res, ml, conf, core = _gate_prepare(df, symbol, feats, cfg)
+    if res is not None:
+        return res
+    llm = None if cfg.force_llm else _llm_cache_get(core)  # AI_FORCE_LLM: always call
+    if llm is not None:
+        return _gate_finish(key, ml, conf, llm, "cached", cfg)
+    llm, llm_status = _openai_call(_gate_prompt(core))
+    if llm_status == "ok":
+        _llm_cache_put(core, llm)
+    return _gate_finish(key, ml, conf, llm, llm_status, cfg)
+
+async def ai_momentum_gate_batch(data, feats=None, return_exceptions=False):
+    """
+    ai_momentum_gate for a basket: {symbol: df or OHLCV} -> {symbol: AIResult}.
+    ML scores and cache hits are resolved inline. The gray-zone symbols that
+    still need the LLM are scored in one multi-entry chat completion; if that
+    reply can't be parsed, they fall back to concurrent per-symbol calls over one
+    aiohttp session (HTTP errors and timeouts are not retried per symbol).
+    Without aiohttp installed, each symbol gets the blocking ai_momentum_gate
+    request in a worker thread. `feats` is an optional {symbol: features}.
+    With `return_exceptions`, a symbol whose features fail maps to the
+    exception instead of aborting the basket (like asyncio.gather).
+    """
+    cfg = _CFG
+    feats = feats or {}
+    out, pending = {}, []
+    for sym, df in data.items():
+        try:
+            key, res, ml, conf, core = _gate_prepare(df, sym, feats.get(sym), cfg)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            out[sym] = e
+            continue
+        if res is not None:
+            out[sym] = res
+            continue
+        llm = None if cfg.force_llm else _llm_cache_get(core)
+        if llm is not None:
+            out[sym] = _gate_finish(key, ml, conf, llm, "cached", cfg)
+        else:
+            pending.append((sym, key, ml, conf, core))
+    if pending:
+        try:
+            import aiohttp
+        except ImportError:
+            aiohttp = None
+        if aiohttp is None:
+            replies = await asyncio.gather(*[asyncio.to_thread(_openai_call, _gate_prompt(p[4])) for p in pending])
+        else:
+            timeout = aiohttp.ClientTimeout(total=25)
+            async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=16)) as http:
+                replies = await _openai_call_batch(http, [p[4] for p in pending]) if len(pending) > 1 else None
+                if replies is None:
+                    replies = await asyncio.gather(*[_openai_call_async(http, _gate_prompt(p[4])) for p in pending])
+        for (sym, key, ml, conf, core), (llm, llm_status) in zip(pending, replies):
+            if llm_status == "ok":
+                _llm_cache_put(core, llm)
+            out[sym] = _gate_finish(key, ml, conf, llm, llm_status, cfg)
+    return {sym: out[sym] for sym in data}
@@ -1,40 +1,60 @@
+import numpy as np
 import pandas as pd
 
-def _candle(df, idx=-1):
-    o = df["open"].iloc[idx]; h = df["high"].iloc[idx]; l = df["low"].iloc[idx]; c = df["close"].iloc[idx]
-    body = abs(c - o); upper = h - max(c, o); lower = min(c, o) - l
-    return o, h, l, c, body, upper, lower
+from utils.ohlcv import OHLCV
+from strategies._patterns_numba import engulf_at, hammer_at, morning_star_at, pattern_masks
+
+DEFAULT_PATTERNS = ("bullish_engulfing", "hammer", "morning_star")
+
+def _arrays(df, tail=None):
+    # (open, high, low, close) as float64 arrays, optionally only the last `tail` bars
+    if isinstance(df, OHLCV):
+        cols = (df.o, df.h, df.l, df.c)
+    else:
+        cols = tuple(df[k].to_numpy() for k in ("open", "high", "low", "close"))
+    if tail is not None:
+        cols = tuple(a[-tail:] for a in cols)
+    return tuple(np.ascontiguousarray(a, dtype=np.float64) for a in cols)
 
 def bullish_engulfing(df: pd.DataFrame) -> bool:
-    if len(df) < 2: return False
-    o1,h1,l1,c1,_,_,_ = _candle(df, -2)
-    o2,h2,l2,c2,_,_,_ = _candle(df, -1)
-    return (c1 < o1) and (c2 > o2) and (c2 >= o1) and (o2 <= c1)  # red then green fully engulfs
+    o, h, l, c = _arrays(df, 2)
+    return len(c) >= 2 and bool(engulf_at(o, h, l, c, len(c) - 1))
 
 def hammer(df: pd.DataFrame) -> bool:
-    if len(df) < 1: return False
-    o,h,l,c,body,upper,lower = _candle(df, -1)
-    total = (h - l) if (h - l) > 0 else 1e-9
-    return (c > o*0.995) and (lower >= 2*body) and (upper <= body) and (body/total <= 0.35)
+    o, h, l, c = _arrays(df, 1)
+    return len(c) >= 1 and bool(hammer_at(o, h, l, c, len(c) - 1))
 
 def morning_star(df: pd.DataFrame) -> bool:
-    if len(df) < 3: return False
-    # red big body, small indecision, then strong green close into red's body
-    o1,h1,l1,c1,body1,_,_ = _candle(df, -3)
-    o2,h2,l2,c2,body2,_,_ = _candle(df, -2)
-    o3,h3,l3,c3,body3,_,_ = _candle(df, -1)
-    cond1 = (c1 < o1) and (body1 > (h1 - l1) * 0.4)
-    cond2 = body2 < (h2 - l2) * 0.2
-    cond3 = (c3 > o3) and (c3 > (o1 - (o1 - c1)*0.5))  # closes into prior red body
-    return cond1 and cond2 and cond3
-
-def bullish_pattern_hit(df: pd.DataFrame, allowed=("bullish_engulfing","hammer","morning_star")):
-    checks = {
-        "bullish_engulfing": bullish_engulfing(df),
-        "hammer": hammer(df),
-        "morning_star": morning_star(df)
-    }
+    o, h, l, c = _arrays(df, 3)
+    return len(c) >= 3 and bool(morning_star_at(o, h, l, c, len(c) - 1))
+
+# name -> (bars needed, kernel testing bar i); bullish_pattern_hit evaluates lazily
+_CHECKS = {
+    "bullish_engulfing": (2, engulf_at),
+    "hammer": (1, hammer_at),
+    "morning_star": (3, morning_star_at),
+}
+
+def bullish_pattern_hit(df: pd.DataFrame, allowed=DEFAULT_PATTERNS):
+    # df: DataFrame or utils.ohlcv.OHLCV; only the last 3 bars are read (converted once).
+    # Patterns are tested in `allowed` order and stop at the first hit.
+    o, h, l, c = _arrays(df, 3)
+    n = len(c); i = n - 1
     for name in allowed:
-        if checks.get(name, False):
+        spec = _CHECKS.get(name)
+        if spec is not None and n >= spec[0] and spec[1](o, h, l, c, i):
             return True, name
     return False, None
+
+def bullish_pattern_mask(df: pd.DataFrame, allowed=DEFAULT_PATTERNS):
+    """
+    Per-bar version of bullish_pattern_hit for backtests: mask[i] is True when any
+    allowed pattern completes at bar i (i.e. bullish_pattern_hit(df.iloc[:i+1])[0]).
+    """
+    o, h, l, c = _arrays(df)
+    masks = dict(zip(DEFAULT_PATTERNS, pattern_masks(o, h, l, c)))
+    out = np.zeros(c.shape[0], dtype=bool)
+    for name in allowed:
+        if name in masks:
+            out |= masks[name]
+    return out
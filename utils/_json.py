@@ -0,0 +1,24 @@
+# Optional orjson: C-backed, bytes in/out. Falls back to stdlib json with the
+# same compact output, so hashes/keys built from dumps() don't depend on which is installed.
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj, sort_keys=False, indent=False) -> bytes:
+    if orjson is not None:
+        opt = (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=opt)
+    if indent:
+        return json.dumps(obj, sort_keys=sort_keys, indent=2).encode()
+    return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":")).encode()
+
+
+def loads(data):
+    # accepts str or bytes
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
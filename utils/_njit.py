@@ -0,0 +1,13 @@
+# Optional numba: njit/prange degrade to no-ops so callers run as plain Python/NumPy.
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        # supports both @njit and @njit(cache=True, ...)
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
@@ -0,0 +1,41 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def pooled_session(pool_connections=4, pool_maxsize=8, retries=2, backoff_factor=0.3,
+                   status_forcelist=(429, 500, 502, 503, 504), headers=None):
+    """
+    requests.Session with keep-alive connection pooling and retry/backoff on
+    transient statuses. After the last retry the response is returned as-is,
+    so callers keep using raise_for_status()/status_code like before.
+    """
+    s = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    if headers:
+        s.headers.update(headers)
+    return s
+
+
+_SHARED = None   # one keep-alive pool for the API clients (OpenAI, Telegram), created on first use
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_session():
+    """Process-wide pooled_session() with default settings, created lazily (thread-safe)."""
+    global _SHARED
+    if _SHARED is None:
+        with _SHARED_LOCK:
+            if _SHARED is None:
+                _SHARED = pooled_session()
+    return _SHARED
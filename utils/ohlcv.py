@@ -0,0 +1,18 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Column-wise (SoA) view of an OHLCV frame: ts as int64 epoch-ns, prices and
+# volume as contiguous float64. Built once per symbol right after the load so
+# downstream TA/feature/pattern code indexes plain arrays instead of Series.
+OHLCV = namedtuple("OHLCV", "ts o h l c v")
+
+def to_ohlcv(df: pd.DataFrame) -> OHLCV:
+    ts = df["ts"] if "ts" in df else pd.Series(df.index)
+    if pd.api.types.is_datetime64_any_dtype(ts):
+        ts = ts.dt.as_unit("ns").astype("int64")
+    return OHLCV(
+        np.ascontiguousarray(ts, dtype=np.int64),
+        *[np.ascontiguousarray(df[c].to_numpy(), dtype=np.float64) for c in ("open", "high", "low", "close", "volume")]
+    )
@@ -1,5 +1,7 @@
 from typing import Dict
 
+import numpy as np
+
 def unrealized_pnl_frac(position: Dict, last_price: float) -> float:
     """
     Fractional PnL of an open long: (P - avg) / avg
@@ -10,6 +12,12 @@ def unrealized_pnl_frac(position: Dict, last_price: float) -> float:
     avg = float(position.get("avg", 0.0))
     return (last_price - avg) / (avg if avg > 0 else last_price)
 
+def market_value(qty, px) -> float:
+    # sum(qty * px) over the open longs (qty <= 0 contributes nothing)
+    qty = np.asarray(qty, dtype=np.float64)
+    px = np.asarray(px, dtype=np.float64)
+    return float(np.sum(np.where(qty > 0, qty * px, 0.0)))
+
 def next_trailing_sl(position: Dict, last_price: float) -> float:
     """
     If trailing is enabled, ratchet SL up when price makes a new high by trail_pct.
@@ -1,5 +1,15 @@
-import json, csv, time
+import os, csv, time, atexit
+from dataclasses import dataclass, field, fields
 from pathlib import Path
+from typing import Optional
+
+from utils import _json
+
+try:  # optional columnar trade log (TRADES_PARQUET=1)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
 
 BASE_DIR = Path(".")
 STATE = BASE_DIR / "state.json"
@@ -7,86 +17,260 @@ LOGS_DIR = BASE_DIR / "logs"
 TRADES_CSV = LOGS_DIR / "trades.csv"
 EQUITY_CSV = LOGS_DIR / "equity.csv"
 AI_CSV = LOGS_DIR / "ai_decisions.csv"
+TRADES_PARQUET_DIR = LOGS_DIR / "trades_parquet"   # one part file per process
 
 LOGS_DIR.mkdir(exist_ok=True, parents=True)
 
-INITIAL_STATE = {
-    "base_ccy": "USDT",
-    "deposits": [],           # [{"ts","amount","note"}]
-    "withdrawals": [],        # [{"ts","amount","note"}]
-    "positions": {},          # symbol -> {"qty","avg","sl","tp","trail_pct","opened_ts"}
-    "realized_pnl_frac": 0.0, # legacy %
-    "realized_pnl_usdt": 0.0, # absolute USDT
-    "day_pnl_frac": {},       # YYYY-MM-DD -> %
-    "day_pnl_usdt": {},       # YYYY-MM-DD -> USDT
-    "loss_streak": 0,
-    "last_trade_day": None
-}
+def _initial_state():
+    # built fresh on every call, so callers never share (or mutate) the template
+    return {
+        "base_ccy": "USDT",
+        "deposits": [],           # [{"ts","amount","note"}]
+        "withdrawals": [],        # [{"ts","amount","note"}]
+        "positions": {},          # symbol -> {"qty","avg","sl","tp","trail_pct","opened_ts"}
+        "realized_pnl_frac": 0.0, # legacy %
+        "realized_pnl_usdt": 0.0, # absolute USDT
+        "day_pnl_frac": {},       # YYYY-MM-DD -> %
+        "day_pnl_usdt": {},       # YYYY-MM-DD -> USDT
+        "loss_streak": 0,
+        "last_trade_day": None,
+        "net_deposits_usdt": 0.0  # running deposits - withdrawals (see total_deposits)
+    }
+
+INITIAL_STATE = _initial_state()
 
 def now_iso():
-    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    # f-string over the struct_time fields: no strftime format parsing per call
+    g = time.gmtime()
+    return f"{g.tm_year:04d}-{g.tm_mon:02d}-{g.tm_mday:02d}T{g.tm_hour:02d}:{g.tm_min:02d}:{g.tm_sec:02d}Z"
+
+_DAY = (None, "")   # (UTC day number, "YYYY-MM-DD")
 
 def day_key():
-    return time.strftime("%Y-%m-%d", time.gmtime())
+    global _DAY
+    n = int(time.time()) // 86400
+    if _DAY[0] != n:
+        g = time.gmtime(n * 86400)
+        _DAY = (n, f"{g.tm_year:04d}-{g.tm_mon:02d}-{g.tm_mday:02d}")
+    return _DAY[1]
 
-def _initial_state():
-    # fresh copy so callers don’t mutate the template
-    return json.loads(json.dumps(INITIAL_STATE))
+@dataclass(slots=True)
+class State:
+    """
+    Typed view of state.json (same keys as INITIAL_STATE plus the run-time ones).
+    Unknown keys are kept in `extras` and written back untouched.
+    """
+    base_ccy: str = "USDT"
+    deposits: list = field(default_factory=list)
+    withdrawals: list = field(default_factory=list)
+    positions: dict = field(default_factory=dict)
+    realized_pnl_frac: float = 0.0
+    realized_pnl_usdt: float = 0.0
+    day_pnl_frac: dict = field(default_factory=dict)
+    day_pnl_usdt: dict = field(default_factory=dict)
+    loss_streak: int = 0
+    last_trade_day: Optional[str] = None
+    net_deposits_usdt: Optional[float] = None  # None: older state.json, rebuilt on first use
+    cash_usdt: Optional[float] = None   # paper wallet; None until run_bot initializes it
+    ai_cache: dict = field(default_factory=dict)  # see strategies.momentum_ai.export_gate_cache
+    extras: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, d):
+        known = {f.name for f in fields(cls)} - {"extras"}
+        kw = {k: v for k, v in d.items() if k in known}
+        return cls(**kw, extras={k: v for k, v in d.items() if k not in known})
+
+    def to_dict(self):
+        d = {f.name: getattr(self, f.name) for f in fields(self) if f.name != "extras"}
+        if d["cash_usdt"] is None:
+            del d["cash_usdt"]
+        if d["net_deposits_usdt"] is None:
+            del d["net_deposits_usdt"]
+        if not d["ai_cache"]:
+            del d["ai_cache"]
+        d.update(self.extras)
+        return d
 
 def read_state():
-    if STATE.exists():
-        with open(STATE, "r") as f:
-            return json.load(f)
-    return _initial_state()
+    # one read_bytes() straight into the (orjson) parser; no exists() stat first
+    try:
+        raw = STATE.read_bytes()
+    except FileNotFoundError:
+        return State.from_dict(_initial_state())
+    return State.from_dict(_json.loads(raw))
 
 def write_state(s):
-    with open(STATE, "w") as f:
-        json.dump(s, f, indent=2)
+    # compact JSON (the bot rewrites it every run); export_state() pretty-prints a copy.
+    # Write a temp file and rename over state.json, so a killed run never leaves it half-written
+    tmp = STATE.with_name(STATE.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_json.dumps(s.to_dict()))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, STATE)
 
-def append_trade(ts, side, symbol, qty, price, pnl_frac=None, pnl_usdt=None, note=""):
-    header = ["ts","side","symbol","qty","price","pnl_frac","pnl_usdt","note"]
-    exists = TRADES_CSV.exists()
-    with open(TRADES_CSV, "a", newline="") as f:
+def export_state(path, s=None):
+    """Write an indented, human-readable copy of the state (default: the cached one) to `path`."""
+    Path(path).write_bytes(_json.dumps((s or get_state()).to_dict(), indent=True))
+
+_STATE = None    # process-wide State, loaded on first get_state()
+_DIRTY = False
+
+def get_state():
+    """Cached State for this process: state.json is parsed once, then mutated in place."""
+    global _STATE
+    if _STATE is None:
+        _STATE = read_state()
+    return _STATE
+
+def mark_dirty():
+    global _DIRTY
+    _DIRTY = True
+
+def flush_state():
+    # write the cached state once if anything changed; also runs at exit
+    global _DIRTY
+    if _STATE is not None and _DIRTY:
+        write_state(_STATE)
+        _DIRTY = False
+
+atexit.register(flush_state)
+
+TRADES_HEADER = ["ts","side","symbol","qty","price","pnl_frac","pnl_usdt","note"]
+AI_HEADER = ["ts","symbol","price","ai_score","ai_conf","passed","use_llm","pattern","ta_buy","ta_sell","note"]
+
+EQUITY_HEADER = ["ts","equity_usdt","deposits_usdt","realized_pnl_frac","note"]
+
+_LOG_WRITERS = {}   # path -> (file handle, csv.writer), opened once per process
+
+def _log_writer(path, header):
+    entry = _LOG_WRITERS.get(path)
+    if entry is None:
+        f = open(path, "a", newline="", buffering=1 << 16)
         w = csv.writer(f)
-        if not exists: w.writerow(header)
-        w.writerow([
-            ts, side, symbol,
-            f"{qty:.10f}", f"{price:.8f}",
-            "" if pnl_frac is None else f"{pnl_frac:.8f}",
-            "" if pnl_usdt is None else f"{pnl_usdt:.2f}",
-            note
-        ])
+        if f.tell() == 0:  # append mode starts at EOF: empty/new file needs the header
+            w.writerow(header)
+        entry = _LOG_WRITERS[path] = (f, w)
+    return entry[1]
+
+def _append_rows(path, header, rows):
+    # rows go to the buffered handle; flush_logs() pushes them to disk
+    _log_writer(path, header).writerows(rows)
+
+# Parquet mirror of trades.csv with typed columns (CSV stays the human-readable log).
+# A ParquetWriter can't append to an existing file, so each process writes its own
+# part file and adds one row group per flush; read the directory with pq.read_table().
+# The file footer is written on close (at exit), so a killed run loses its part.
+TRADES_SCHEMA = None if pa is None else pa.schema([
+    ("ts", pa.string()), ("side", pa.string()), ("symbol", pa.string()),
+    ("qty", pa.float64()), ("price", pa.float64()),
+    ("pnl_frac", pa.float64()), ("pnl_usdt", pa.float64()), ("note", pa.string()),
+])
+_PARQUET_ON = pa is not None and str(os.getenv("TRADES_PARQUET", "0")).lower() in ("1","true","yes","on")
+_PARQUET_FLUSH_ROWS = 1000
+_PQ_ROWS = []
+_PQ_WRITER = None
+
+def _parquet_add(rows):
+    # rows: append_trade() argument tuples
+    if not _PARQUET_ON:
+        return
+    _PQ_ROWS.extend(tuple(r) + (None,) * (8 - len(r)) for r in rows)
+    if len(_PQ_ROWS) >= _PARQUET_FLUSH_ROWS:
+        _parquet_flush()
+
+def _parquet_flush():
+    global _PQ_WRITER
+    if not _PQ_ROWS:
+        return
+    cols = list(zip(*_PQ_ROWS))
+    cols[7] = ["" if n is None else n for n in cols[7]]   # note defaults to "" like the CSV
+    batch = pa.RecordBatch.from_arrays(
+        [pa.array(col, type=fld.type) for col, fld in zip(cols, TRADES_SCHEMA)], schema=TRADES_SCHEMA)
+    if _PQ_WRITER is None:
+        TRADES_PARQUET_DIR.mkdir(exist_ok=True, parents=True)
+        part = TRADES_PARQUET_DIR / f"part-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{os.getpid()}.parquet"
+        _PQ_WRITER = pq.ParquetWriter(part, TRADES_SCHEMA, compression="zstd")
+    _PQ_WRITER.write_batch(batch)
+    _PQ_ROWS.clear()
+
+def _parquet_close():
+    global _PQ_WRITER
+    if _PARQUET_ON:
+        _parquet_flush()
+    if _PQ_WRITER is not None:
+        _PQ_WRITER.close()
+        _PQ_WRITER = None
+
+def flush_logs():
+    # one flush+fsync per open CSV (end of a run, and at exit); buffered parquet
+    # trade rows become one row group
+    for f, _ in _LOG_WRITERS.values():
+        if not f.closed:
+            f.flush()
+            os.fsync(f.fileno())
+    if _PARQUET_ON:
+        _parquet_flush()
+
+atexit.register(_parquet_close)
+atexit.register(flush_logs)   # atexit is LIFO: CSVs flushed first, then the parquet footer
+
+def _trade_row(ts, side, symbol, qty, price, pnl_frac=None, pnl_usdt=None, note=""):
+    return [
+        ts, side, symbol,
+        f"{qty:.10f}", f"{price:.8f}",
+        "" if pnl_frac is None else f"{pnl_frac:.8f}",
+        "" if pnl_usdt is None else f"{pnl_usdt:.2f}",
+        note
+    ]
+
+def _ai_row(ts, symbol, price, ai_score, ai_conf, passed, use_llm, pattern, ta_buy, ta_sell, note=""):
+    return [
+        ts, symbol, f"{price:.8f}", f"{ai_score:.1f}", f"{ai_conf:.0f}",
+        "1" if passed else "0", "1" if use_llm else "0",
+        pattern or "", "1" if ta_buy else "0", "1" if ta_sell else "0",
+        note or ""
+    ]
+
+def append_trade(ts, side, symbol, qty, price, pnl_frac=None, pnl_usdt=None, note=""):
+    _append_rows(TRADES_CSV, TRADES_HEADER, [_trade_row(ts, side, symbol, qty, price, pnl_frac, pnl_usdt, note)])
+    _parquet_add([(ts, side, symbol, qty, price, pnl_frac, pnl_usdt, note)])
+
+def append_trade_batch(rows):
+    """rows: iterable of append_trade() argument tuples, written in one go."""
+    rows = list(rows)
+    if rows:
+        _append_rows(TRADES_CSV, TRADES_HEADER, [_trade_row(*r) for r in rows])
+        _parquet_add(rows)
 
 def append_ai_decision(ts, symbol, price, ai_score, ai_conf, passed, use_llm, pattern, ta_buy, ta_sell, note=""):
-    header = ["ts","symbol","price","ai_score","ai_conf","passed","use_llm","pattern","ta_buy","ta_sell","note"]
-    exists = AI_CSV.exists()
-    with open(AI_CSV, "a", newline="") as f:
-        w = csv.writer(f)
-        if not exists: w.writerow(header)
-        w.writerow([
-            ts, symbol, f"{price:.8f}", f"{ai_score:.1f}", f"{ai_conf:.0f}",
-            "1" if passed else "0", "1" if use_llm else "0",
-            pattern or "", "1" if ta_buy else "0", "1" if ta_sell else "0",
-            note or ""
-        ])
+    _append_rows(AI_CSV, AI_HEADER, [_ai_row(ts, symbol, price, ai_score, ai_conf, passed, use_llm, pattern, ta_buy, ta_sell, note)])
+
+def append_ai_decision_batch(rows):
+    """rows: iterable of append_ai_decision() argument tuples, written in one go."""
+    rows = [_ai_row(*r) for r in rows]
+    if rows:
+        _append_rows(AI_CSV, AI_HEADER, rows)
 
 def append_equity(ts, equity_usdt, deposits_usdt, realized_pnl_frac, note=""):
-    header = ["ts","equity_usdt","deposits_usdt","realized_pnl_frac","note"]
-    exists = EQUITY_CSV.exists()
-    with open(EQUITY_CSV, "a", newline="") as f:
-        w = csv.writer(f)
-        if not exists: w.writerow(header)
-        w.writerow([ts, f"{equity_usdt:.2f}", f"{deposits_usdt:.2f}", f"{realized_pnl_frac:.6f}", note])
+    _append_rows(EQUITY_CSV, EQUITY_HEADER,
+                 [[ts, f"{equity_usdt:.2f}", f"{deposits_usdt:.2f}", f"{realized_pnl_frac:.6f}", note]])
 
 def total_deposits(state):
-    return sum(d["amount"] for d in state.get("deposits", [])) - sum(w["amount"] for w in state.get("withdrawals", []))
+    # running total kept by record_deposit/record_withdraw; summed once for older state files
+    if state.net_deposits_usdt is None:
+        state.net_deposits_usdt = sum(d["amount"] for d in state.deposits) - sum(w["amount"] for w in state.withdrawals)
+    return state.net_deposits_usdt
 
 def record_deposit(amount, note=""):
-    s = read_state()
-    s["deposits"].append({"ts": now_iso(), "amount": float(amount), "note": note})
-    write_state(s)
+    s = get_state()
+    s.net_deposits_usdt = total_deposits(s) + float(amount)
+    s.deposits.append({"ts": now_iso(), "amount": float(amount), "note": note})
+    mark_dirty()
 
 def record_withdraw(amount, note=""):
-    s = read_state()
-    s["withdrawals"].append({"ts": now_iso(), "amount": float(amount), "note": note})
-    write_state(s)
+    s = get_state()
+    s.net_deposits_usdt = total_deposits(s) - float(amount)
+    s.withdrawals.append({"ts": now_iso(), "amount": float(amount), "note": note})
+    mark_dirty()
@@ -1,15 +1,63 @@
-import os, requests
+import os, time, queue, atexit, threading
+
+from utils.http import shared_session
+
+_Q = queue.Queue(maxsize=256)   # (url, payload) waiting for the sender thread
+_WORKER = None
+_WORKER_LOCK = threading.Lock()
+_LAST = ("", 0.0)   # (text, monotonic ts) of the last queued message
+_DEDUP_SECS = 5.0
+_DRAIN_SECS = 15.0
+
+def _worker():
+    while True:
+        item = _Q.get()
+        try:
+            if item is None:
+                return
+            url, payload = item
+            shared_session().post(url, json=payload, timeout=10)
+        except Exception:
+            pass
+        finally:
+            _Q.task_done()
+
+def _drain():
+    # at exit: let queued messages go out (bounded), then stop the worker
+    if _WORKER is None:
+        return
+    try:
+        _Q.put(None, timeout=_DRAIN_SECS)
+    except queue.Full:
+        return
+    _WORKER.join(_DRAIN_SECS)
+
+def _ensure_worker():
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is None:
+            _WORKER = threading.Thread(target=_worker, name="telegram-notify", daemon=True)
+            _WORKER.start()
+            atexit.register(_drain)
 
 def notify(text: str):
+    """
+    Queue a Telegram message; a background thread sends it, so the caller never
+    waits on the network. Repeats of the previous message within a few seconds
+    are dropped, as are messages when the queue is full.
+    """
+    global _LAST
     token = os.getenv("TELEGRAM_TOKEN", "")
     chat_id = os.getenv("TELEGRAM_CHAT_ID", "")
     if not token or not chat_id or not text:
         return
+    text = text[:4000]
+    now = time.monotonic()
+    if _LAST[0] == text and now - _LAST[1] < _DEDUP_SECS:
+        return
+    _LAST = (text, now)
+    _ensure_worker()
     try:
-        requests.post(
-            f"https://api.telegram.org/bot{token}/sendMessage",
-            json={"chat_id": chat_id, "text": text[:4000]},
-            timeout=10,
-        )
-    except Exception:
+        _Q.put_nowait((f"https://api.telegram.org/bot{token}/sendMessage", {"chat_id": chat_id, "text": text}))
+    except queue.Full:
         pass